@@ -1,11 +1,16 @@
 __package__ = 'ps3iso'
 
+import os
 import sys
-import shutil
+import sqlite3
 from argparse import ArgumentParser as _ArgumentParser
 from pathlib import Path
 
+from .cache import SfoCache
 from .game import Game
+from .output import OUTPUT_WRITERS, open_writer
+from .rename import RenameJournal, RenameJournalError, print_results
+from .sfo.format import FormatTemplate
 
 
 class ArgumentParserError(Exception):
@@ -21,23 +26,91 @@ class ArgumentParser(_ArgumentParser):
 
 def get_argparser(argv=None):
     parser = ArgumentParser()
+    parser.add_argument('command',
+                        nargs='?',
+                        choices=('info', 'validate'),
+                        default='info',
+                        help='Print information about each image (the default), '
+                             'or check the SFO data of each image and report every problem found')
     parser.add_argument('-i', '--input',
                         type=Path,
-                        required=True,
-                        help='Path to the ISO file or directory containing ISO files')
+                        help='Path to the ISO file or directory containing ISO files (required unless resuming '
+                             'or rolling back a rename)')
+    parser.add_argument('-r', '--recursive',
+                        action='store_true',
+                        help='Search for ISO files in subdirectories')
+    parser.add_argument('--max-depth',
+                        type=int,
+                        help='Maximum depth of subdirectories to search (implies --recursive)')
+    parser.add_argument('--follow-symlinks',
+                        action='store_true',
+                        help='Follow symbolic links to directories. Links to ISO files are always included')
     parser.add_argument('-f', '--format',
                         help='Format string to use for output or --rename target')
     parser.add_argument('--rename',
                         action='store_true',
                         help='Rename .iso and supporting files to a format string based on SFO metadata')
+    parser.add_argument('--journal',
+                        type=Path,
+                        help='With --rename, record the renames in a new journal file, '
+                             'which can be used with --resume or --rollback if the rename is interrupted')
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help='Finish the renames recorded in --journal, without scanning any images')
+    parser.add_argument('--rollback',
+                        action='store_true',
+                        help='Undo the renames recorded in --journal, without scanning any images')
+    parser.add_argument('-o', '--output',
+                        choices=('text', *OUTPUT_WRITERS),
+                        default='text',
+                        help='Output format: text (the default), or one JSON object, CSV or TSV row, '
+                             'or NUL-terminated path per game. With -f/--format, only the parameters it uses '
+                             'are included, and null output renders it in place of the path')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of images to read, or journaled renames to run, concurrently')
+    parser.add_argument('--unordered',
+                        action='store_true',
+                        help='Output games as soon as they are read, instead of in path order (with --jobs)')
+    parser.add_argument('--no-cache',
+                        action='store_true',
+                        help='Do not use the persistent SFO metadata cache')
+    parser.add_argument('--refresh',
+                        action='store_true',
+                        help='Read SFO metadata from every image again, updating the cache')
     return parser
 
 
 def parse_args(argv=None):
     parser = get_argparser()
     _args = parser.parse_args(argv)
+    if _args.resume or _args.rollback:
+        if _args.journal is None:
+            parser.error('--journal is required for --resume and --rollback')
+        if _args.resume and _args.rollback:
+            parser.error('--resume and --rollback cannot be used together')
+        if _args.rename:
+            parser.error('--rename cannot be used with --resume or --rollback')
+    elif _args.input is None:
+        parser.error('the following arguments are required: -i/--input')
+    elif _args.journal is not None:
+        if not _args.rename:
+            parser.error('--journal can only be used with --rename, --resume or --rollback')
+        if _args.journal.exists():
+            parser.error('--journal %s already exists, use --resume or --rollback' % _args.journal)
+    if _args.rename and _args.command == 'validate':
+        parser.error('--rename cannot be used with validate')
+    if _args.output != 'text' and (_args.rename or _args.command == 'validate'):
+        parser.error('-o/--output can only be used when printing information')
     if _args.rename and _args.format is None:
         parser.error('-f/--format is required for rename operation')
+    if _args.jobs < 1:
+        parser.error('-j/--jobs must be at least 1')
+    if _args.max_depth is not None:
+        if _args.max_depth < 0:
+            parser.error('--max-depth must not be negative')
+        _args.recursive = True
     return _args
 
 
@@ -47,24 +120,73 @@ def main(argv=None):
     except ArgumentParserError:
         sys.exit(1)
 
-    if shutil.which('isoinfo') is None:
-        print("Error: 'isoinfo' is required, but could not be found in the system PATH.\n"
-              'Please install it to continue:\n'
-              '    Windows:  https://smithii.com/files/cdrtools-latest.zip\n'
-              '    macOS:    brew install cdrtools\n'
-              '    Linux:    apt/dnf install genisoimage\n')
-        sys.exit(1)
-
-    games = Game.search(args.input)
-
-    if args.rename:
-        if args.input.resolve().is_dir():
-            print('Scanning directory for PS3 ISOs...')
-        Game.rename_all(list(games), args.format)
+    if args.resume or args.rollback:
+        try:
+            journal = RenameJournal.load(args.journal)
+        except (OSError, RenameJournalError) as ex:
+            print('Unable to read the rename journal: %s' % ex, file=sys.stderr)
+            sys.exit(1)
+        with journal:
+            failed = print_results(journal.rollback(args.jobs) if args.rollback else journal.run(args.jobs))
+        if failed:
+            sys.exit(1)
+        return
+
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = SfoCache(refresh=args.refresh)
+        except (OSError, sqlite3.Error) as ex:
+            print('Warning: unable to open the metadata cache: %s' % ex, file=sys.stderr)
 
-    else:
-        for game in games:
-            game.print_info(args.format)
+    try:
+        if args.command == 'validate':
+            games = Game.search(args.input, cache=cache, recursive=args.recursive, max_depth=args.max_depth,
+                                follow_symlinks=args.follow_symlinks)
+            checked = failed = 0
+            for game, problems in Game.validate_all(games, jobs=args.jobs, ordered=not args.unordered):
+                checked += 1
+                if problems:
+                    failed += 1
+                    for problem in problems:
+                        print(f'{game.iso}: {problem}')
+            print(f'{failed} of {checked} images failed validation')
+            if failed:
+                sys.exit(1)
+            return
+
+        # Compile the format string once for every game, and only read the parameters it uses
+        template = None if args.format is None else FormatTemplate(args.format, file_variables=not args.rename)
+        writer = None if args.output == 'text' else open_writer(args.output, sys.stdout, template)
+        if writer is not None:
+            keys = writer.keys
+        else:
+            keys = None if template is None else template.keys
+        games = Game.search(args.input, jobs=args.jobs, ordered=not args.unordered, cache=cache,
+                            recursive=args.recursive, max_depth=args.max_depth,
+                            follow_symlinks=args.follow_symlinks, keys=keys)
+
+        if writer is not None:
+            try:
+                with writer:
+                    writer.write_all(games)
+            except BrokenPipeError:
+                # The consumer stopped reading, e.g. `ps3iso -o jsonl | head`
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                sys.exit(1)
+
+        elif args.rename and template is not None:
+            # parse_args requires -f/--format with --rename
+            if args.input.resolve().is_dir():
+                print('Scanning directory for PS3 ISOs...')
+            Game.rename_all(list(games), template, journal=args.journal, jobs=args.jobs)
+
+        else:
+            for game in games:
+                game.print_info(template)
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+
+def _int64(n: int) -> int:
+    # SQLite integers are signed 64-bit, device and inode numbers may not fit
+    return n - (1 << 64) if n >= (1 << 63) else n
+
+
+class SfoCache(object):
+    """
+    Persistent cache of PARAM.SFO data extracted from image files, stored in an SQLite database.
+
+    Entries are keyed by file identity ``(device, inode, size, mtime_ns)``, so renamed files are still
+    found in the cache, and modified files are never served stale data.
+    The database may safely be shared by several threads and processes.
+
+    Least recently used entries are evicted when the cache is closed, once it holds more than ``max_entries``.
+
+    :param path: Database file, defaults to :meth:`.default_path`
+    :param max_entries: Maximum number of entries to keep
+    :param refresh: Ignore existing entries, replacing them as files are read again
+
+    :Example:
+
+    >>> with SfoCache(':memory:') as cache:
+    ...     cache.put('tests/data/PARAM.SFO', b'data', {'TITLE_ID': 'BLES00000'})
+    ...     cache.get('tests/data/PARAM.SFO')
+    b'data'
+
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: Union[str, Path, None] = None, max_entries=100000, refresh=False):
+        if path is None:
+            path = self.default_path()
+        if str(path) != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._accessed = set()
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+
+    @staticmethod
+    def default_path() -> Path:
+        """
+        Default database location, ``$XDG_CACHE_HOME/ps3iso/sfo.sqlite3`` (or ``~/.cache/ps3iso/sfo.sqlite3``)
+        """
+        cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+        return Path(cache_home) / 'ps3iso' / 'sfo.sqlite3'
+
+    def _create_schema(self) -> None:
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                version = self._db.execute('PRAGMA user_version').fetchone()[0]
+                if version != self.SCHEMA_VERSION:
+                    self._db.execute('DROP TABLE IF EXISTS sfo')
+                    self._db.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS sfo ('
+                    'dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, '
+                    'path TEXT, data BLOB, parameters TEXT, accessed REAL, '
+                    'PRIMARY KEY (dev, ino, size, mtime_ns))')
+                self._db.execute('CREATE INDEX IF NOT EXISTS sfo_accessed ON sfo (accessed)')
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def _key(path: Union[str, Path], stat: Optional[os.stat_result]) -> tuple:
+        if stat is None:
+            stat = os.stat(path)
+        return _int64(stat.st_dev), _int64(stat.st_ino), stat.st_size, stat.st_mtime_ns
+
+    def _lookup(self, column: str, path, stat):
+        if self.refresh:
+            return None
+        key = self._key(path, stat)
+        with self._lock:
+            row = self._db.execute(
+                f'SELECT {column} FROM sfo WHERE dev=? AND ino=? AND size=? AND mtime_ns=?', key).fetchone()
+            if row is None:
+                return None
+            self._accessed.add(key)
+        return row[0]
+
+    def get(self, path: Union[str, Path], stat: Optional[os.stat_result] = None) -> Optional[bytes]:
+        """
+        Return the cached raw PARAM.SFO data for a file, or ``None`` if it is not cached
+
+        :param path: Path to the image file
+        :param stat: Result of :func:`os.stat` for the file, if already known
+        """
+        return self._lookup('data', path, stat)
+
+    def get_parameters(self, path: Union[str, Path], stat: Optional[os.stat_result] = None) -> Optional[dict]:
+        """
+        Return the cached SFO parameter values for a file, or ``None`` if it is not cached.
+        Only the parameters which were read when the file was cached are included.
+
+        :param path: Path to the image file
+        :param stat: Result of :func:`os.stat` for the file, if already known
+        """
+        parameters = self._lookup('parameters', path, stat)
+        return None if parameters is None else json.loads(parameters)
+
+    def put(self, path: Union[str, Path], data: bytes, parameters: dict,
+            stat: Optional[os.stat_result] = None) -> None:
+        """
+        Store the PARAM.SFO data for a file
+
+        :param path: Path to the image file
+        :param data: Raw PARAM.SFO data
+        :param parameters: Parsed SFO parameter values, which may only be those requested
+        :param stat: Result of :func:`os.stat` for the file, if already known
+        """
+        key = self._key(path, stat)
+        row = (*key, str(path), bytes(data), json.dumps(parameters), time.time())
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO sfo VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+    def prune(self, max_entries: Optional[int] = None) -> int:
+        """
+        Evict the least recently used entries, keeping at most ``max_entries``
+
+        :param max_entries: Number of entries to keep, defaults to the value given to the constructor
+        :return: Number of entries removed
+        """
+        if max_entries is None:
+            max_entries = self.max_entries
+        with self._lock:
+            cursor = self._db.execute(
+                'DELETE FROM sfo WHERE rowid IN '
+                '(SELECT rowid FROM sfo ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (max_entries,))
+            return cursor.rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM sfo').fetchone()[0]
+
+    def flush(self) -> None:
+        """
+        Record the access time of entries read since the last flush
+        """
+        with self._lock:
+            accessed, self._accessed = self._accessed, set()
+            if accessed:
+                now = time.time()
+                self._db.execute('BEGIN')
+                self._db.executemany(
+                    'UPDATE sfo SET accessed=? WHERE dev=? AND ino=? AND size=? AND mtime_ns=?',
+                    ((now, *key) for key in accessed))
+                self._db.execute('COMMIT')
+
+    def close(self) -> None:
+        """
+        Flush access times, evict old entries and close the database
+        """
+        self.flush()
+        self.prune()
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
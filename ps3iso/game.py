@@ -1,64 +1,324 @@
 from __future__ import annotations
-import io
+import os
 import re
 import glob
+import shutil
+import asyncio
 import subprocess
 from pathlib import Path
-from collections import Counter
-from typing import Iterator, Union, List
+from typing import AsyncIterator, Callable, Iterable, Iterator, Optional, Set, Tuple, Union, List
 
+from .cache import SfoCache
+from .iso9660 import SECTOR_SIZE, IsoDirectoryRecord, IsoImage, IsoError, IsoFileNotFoundError, patch_image
+from .rename import RenameJournal, _move, plan_renames, print_results
+from .scan import DirectoryIndex, parallel_map, walk
 from .sfo import SfoFile
+from .sfo.format import FormatTemplate
 from .sfo.errors import SfoParseError
 
 
+SFO_PATHS = ('/PS3_GAME/PARAM.SFO', '/PSP_GAME/PARAM.SFO')
+ISOINFO_SFO_PATHS = ('/PS3_GAME/PARAM.SFO;1', '/PSP_GAME/PARAM.SFO')
+
+
 class Game(object):
     """
     Class representing a set of files making up a Playstation 3 game
     An existing ``.iso`` file must be passed, files with any extension matching the base name
     will be found and included in all operations
 
+    The SFO data and the list of files are only read when they are first accessed.
+
     :param Path or str iso_path: Path to an existing .iso file
+    :param SfoFile sfo: Use already extracted SFO data instead of reading it from the image
+    :param SfoCache cache: Look up and store SFO data in a persistent cache
+    :param os.stat_result stat: Stat data of the .iso file, if already known
+    :param companions: Names of the files in the same directory sharing the base name, if already known
+    :param keys: Only read these SFO parameters, see :meth:`.SfoFile.format_keys`
     """
 
-    def __init__(self, iso_path):
+    def __init__(self, iso_path, sfo=None, cache=None, stat=None, companions=None, keys=None):
 
         self.iso = Path(iso_path).resolve()
-        self.sfo = self.extract_sfo(self.iso)
-        self.files = {self.iso, *self.iso.parent.glob(glob.escape(self.iso.stem) + '.*')}
+        self._sfo = sfo
+        self._files = None
+        self._cache = cache
+        self._stat = stat
+        self._entry = None
+        self._companions = companions
+        self._keys = None if keys is None else frozenset(keys)
+
+    @classmethod
+    def from_path(cls, iso_path: Union[str, Path], sfo=None, cache=None, stat=None, companions=None,
+                  keys=None) -> Game:
+        """
+        Create a game without touching the file system.
+        Unlike the constructor, the path is made absolute but symbolic links are not resolved.
+
+        :param iso_path: Path to an .iso file
+        :param sfo: Use already extracted SFO data instead of reading it from the image
+        :param cache: Look up and store SFO data in a persistent cache
+        :param stat: Stat data of the .iso file, if already known
+        :param companions: Names of the files in the same directory sharing the base name, if already known
+        :param keys: Only read these SFO parameters
+        """
+        game = cls.__new__(cls)
+        game.iso = Path(os.path.abspath(iso_path))
+        game._sfo = sfo
+        game._files = None
+        game._cache = cache
+        game._stat = stat
+        game._entry = None
+        game._companions = companions
+        game._keys = None if keys is None else frozenset(keys)
+        return game
+
+    @classmethod
+    def from_entry(cls, entry: os.DirEntry, index: Optional[DirectoryIndex] = None, cache=None, keys=None) -> Game:
+        """
+        Create a game from a directory entry found by :func:`.walk`, reusing its stat data and directory index
+
+        :param entry: Directory entry of the .iso file
+        :param index: Index of the directory containing the entry
+        :param cache: Look up and store SFO data in a persistent cache
+        :param keys: Only read these SFO parameters
+        """
+        companions = None if index is None else index.companions(Path(entry.name).stem)
+        game = cls.from_path(entry.path, cache=cache, companions=companions, keys=keys)
+        game._entry = entry
+        return game
+
+    @property
+    def sfo(self) -> SfoFile:
+        """
+        SFO data of the game, read from the image when first accessed
+        """
+        if self._sfo is None:
+            # Reuse the stat data of a directory entry, otherwise leave it to the cache to stat the file
+            stat = self.stat if self._cache is not None and self._entry is not None else self._stat
+            self._sfo = self.extract_sfo(self.iso, cache=self._cache, stat=stat, keys=self._keys)
+        return self._sfo
+
+    @sfo.setter
+    def sfo(self, sfo: SfoFile):
+        self._sfo = sfo
+
+    @property
+    def files(self) -> Set[Path]:
+        """
+        Set of all files belonging to the game, found when first accessed
+        """
+        if self._files is None:
+            if self._companions is None:
+                self._files = {self.iso, *self.iso.parent.glob(glob.escape(self.iso.stem) + '.*')}
+            else:
+                self._files = {self.iso, *(self.iso.parent / name for name in self._companions)}
+        return self._files
+
+    @files.setter
+    def files(self, files: Set[Path]):
+        self._files = set(files)
+
+    @property
+    def stat(self) -> os.stat_result:
+        """
+        Stat data of the .iso file
+        """
+        if self._stat is None:
+            self._stat = self._entry.stat() if self._entry is not None else self.iso.stat()
+        return self._stat
+
+    @property
+    def size(self) -> int:
+        """
+        Size of the .iso file in bytes
+        """
+        return self.stat.st_size
+
+    def load(self) -> Game:
+        """
+        Read the SFO data and find all files now, instead of on first access
+
+        :return: The game itself
+        """
+        self.sfo
+        self.files
+        return self
 
     @property
     def exists(self):
         return self.iso.exists()
 
+    def open_image(self) -> IsoImage:
+        """
+        Memory-map the game's ``.iso`` file for direct access to its contents,
+        e.g. ``image.read_file('/PS3_GAME/ICON0.PNG')``
+
+        .. seealso:: :class:`.IsoImage`
+        """
+        return IsoImage.open(self.iso)
+
     @classmethod
-    def extract_sfo(cls, iso_path: Union[str, Path]) -> SfoFile:
+    def extract_sfo(cls, iso_path: Union[str, Path], cache: Optional[SfoCache] = None,
+                    stat: Optional[os.stat_result] = None, keys: Optional[Iterable[str]] = None) -> SfoFile:
         """
-        Read the PARAM.SFO data from an ``.iso`` file
+        Read the PARAM.SFO data from an ``.iso`` file.
+        The image is read directly using :class:`.IsoImage`, falling back to ``isoinfo``
+        (if found in the system PATH) for images that cannot be read natively.
 
         .. seealso:: :meth:`.SfoFile.parse`
 
         :param iso_path: Path to the .iso file to read
+        :param cache: Look up and store the SFO data in a persistent cache
+        :param stat: Stat data of the .iso file used as the cache key, if already known
+        :param keys: Only read these SFO parameters
         """
         iso_path = Path(iso_path)
+        try:
+            return cls._extract_sfo_native(iso_path, cache, stat, keys)
+        except IsoError:
+            if shutil.which('isoinfo') is None:
+                raise
+            return cls._parse_sfo(iso_path, cls._read_sfo_isoinfo(iso_path), cache, stat, keys)
+
+    @classmethod
+    async def aextract_sfo(cls, iso_path: Union[str, Path], cache: Optional[SfoCache] = None,
+                           stat: Optional[os.stat_result] = None, keys: Optional[Iterable[str]] = None) -> SfoFile:
+        """
+        Asynchronous version of :meth:`.extract_sfo`.
+        Native reads are run in the event loop's default executor,
+        and the ``isoinfo`` fallback is run as an asynchronous subprocess.
+
+        :param iso_path: Path to the .iso file to read
+        :param cache: Look up and store the SFO data in a persistent cache
+        :param stat: Stat data of the .iso file used as the cache key, if already known
+        :param keys: Only read these SFO parameters
+        """
+        iso_path = Path(iso_path)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, cls._extract_sfo_native, iso_path, cache, stat, keys)
+        except IsoError:
+            if shutil.which('isoinfo') is None:
+                raise
+            data = await cls._aread_sfo_isoinfo(iso_path)
+            return await loop.run_in_executor(None, cls._parse_sfo, iso_path, data, cache, stat, keys)
+
+    @classmethod
+    def _extract_sfo_native(cls, iso_path: Path, cache: Optional[SfoCache] = None,
+                            stat: Optional[os.stat_result] = None, keys: Optional[Iterable[str]] = None) -> SfoFile:
         if not iso_path.exists():
             return SfoFile()
-        cmd = ['isoinfo', '-i', str(iso_path), '-f']
-        proc = subprocess.run(cmd, capture_output=True)
-        proc.check_returncode()
-        valid_paths = [b'/PS3_GAME/PARAM.SFO;1', b'/PSP_GAME/PARAM.SFO']
-        path = next(filter(lambda x: x in valid_paths, proc.stdout.split()), False)
-        assert path, "PARAM.SFO not found."
-        cmd = ['isoinfo', '-i', str(iso_path), '-x', path]
-        proc = subprocess.run(cmd, capture_output=True)
-        proc.check_returncode()
+        data = None if cache is None else cache.get(iso_path, stat)
+        if data is not None:
+            return cls._parse_sfo(iso_path, data, keys=keys)
+        with IsoImage.open(iso_path) as image:
+            data = bytes(cls._find_sfo(image, iso_path))
+        return cls._parse_sfo(iso_path, data, cache, stat, keys)
+
+    @staticmethod
+    def _parse_sfo(iso_path: Path, data, cache: Optional[SfoCache] = None,
+                   stat: Optional[os.stat_result] = None, keys: Optional[Iterable[str]] = None) -> SfoFile:
         try:
-            with io.BytesIO(proc.stdout) as f:
-                return SfoFile.parse(f)
+            sfo = SfoFile.parse(data, lazy=True, keys=keys)
+            if cache is not None:
+                # The raw data is always cached whole, so other parameters can be read from it later
+                cache.put(iso_path, data, sfo.parameters._asdict(), stat)
         except SfoParseError as ex:
             ex.args = ('Error while extracting SFO from %s: %s' % (iso_path, str(ex)),)
             raise
+        return sfo
+
+    @classmethod
+    def _find_sfo(cls, image: IsoImage, iso_path: Path) -> memoryview:
+        record = cls._find_sfo_record(image, iso_path)
+        return image.view(record.extent, record.size)
+
+    @staticmethod
+    def _find_sfo_record(image: IsoImage, iso_path: Path) -> IsoDirectoryRecord:
+        for path in SFO_PATHS:
+            record = image.find(path)
+            if record is not None and not record.is_dir:
+                return record
+        raise IsoFileNotFoundError('PARAM.SFO not found in %s' % iso_path)
+
+    def patch_sfo(self, backup: Union[str, Path, None] = None, **changes) -> bool:
+        """
+        Change SFO parameter values directly inside the ``.iso`` file, without rebuilding the image.
+
+        Values which fit in the space already allocated to them are overwritten in place.
+        Otherwise the whole PARAM.SFO is rewritten, as long as it still fits in the sectors allocated to it,
+        and its length is updated in the directory record. Only a few sectors of the image are written either way.
+
+        .. seealso:: :meth:`.SfoFile.patch_file`, :func:`.restore_image`
+
+        :param backup: Save the original contents of every sector which is overwritten to this file
+        :param changes: New parameter values by name
+        :return: True if the values were patched in place, False if the PARAM.SFO was rewritten
+        """
+        with self.open_image() as image:
+            record = self._find_sfo_record(image, self.iso)
+            data = bytes(image.view(record.extent, record.size))
+        start = record.extent * SECTOR_SIZE
+
+        writes = SfoFile._plan_patch(data, changes)
+        in_place = writes is not None
+        if in_place:
+            writes = [(start + offset, b) for offset, b in writes]
+            # Nothing past the end of the PARAM.SFO may be touched, it could belong to another file
+            end = start + record.size
+            if any(offset < start or offset + len(b) > end for offset, b in writes):
+                raise IsoError('The patched values extend past the PARAM.SFO data in %s' % self.iso)
+        else:
+            sfo = SfoFile.parse(data)
+            for name, value in changes.items():
+                sfo.set_parameter(name, value)
+            new_data = bytes(sfo)
+            allocated = -(-record.size // SECTOR_SIZE) * SECTOR_SIZE
+            if len(new_data) > allocated:
+                raise IsoError('The changed PARAM.SFO (%d bytes) does not fit in the %d bytes allocated in %s' % (
+                    len(new_data), allocated, self.iso))
+            # Clear the rest of the old data when the file shrinks
+            writes = [(start, new_data.ljust(record.size, b'\0'))]
+            if len(new_data) != record.size:
+                writes.append((record.offset + 10, IsoDirectoryRecord.pack_size(len(new_data))))
 
-    def format_file(self, f: Union[str, Path], fmt: str, fill='') -> Path:
+        patch_image(self.iso, writes, backup)
+        # Read the SFO data again when it is next accessed
+        self._sfo = None
+        self._stat = None
+        self._entry = None
+        return in_place
+
+    @staticmethod
+    def _read_sfo_isoinfo(iso_path: Path) -> bytes:
+        # Extract each candidate path directly, rather than listing the whole filesystem
+        for path in ISOINFO_SFO_PATHS:
+            cmd = ['isoinfo', '-i', str(iso_path), '-x', path]
+            proc = subprocess.run(cmd, capture_output=True)
+            proc.check_returncode()
+            if proc.stdout:
+                return proc.stdout
+        raise IsoFileNotFoundError('PARAM.SFO not found in %s' % iso_path)
+
+    @staticmethod
+    async def _aread_sfo_isoinfo(iso_path: Path) -> bytes:
+        for path in ISOINFO_SFO_PATHS:
+            cmd = ['isoinfo', '-i', str(iso_path), '-x', path]
+            proc = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            try:
+                stdout, stderr = await proc.communicate()
+            except asyncio.CancelledError:
+                proc.kill()
+                await proc.wait()
+                raise
+            if proc.returncode:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+            if stdout:
+                return stdout
+        raise IsoFileNotFoundError('PARAM.SFO not found in %s' % iso_path)
+
+    def format_file(self, f: Union[str, Path], fmt: Union[str, FormatTemplate], fill='') -> Path:
         """
         Return a new path for an input file, formatted according to the SFO data and format string.
         The existing file extension will be preserved.
@@ -66,15 +326,17 @@ class Game(object):
         .. seealso:: :meth:`.SfoFile.format`
 
         :param f: Path to an existing file
-        :param fmt: Formatting string to use for new file name
+        :param fmt: Formatting string or compiled template to use for new file name
         :param fill: String to use for replacing invalid characters
         """
         f = Path(f)
-        name = self.sfo.format(fmt)
+        if not isinstance(fmt, FormatTemplate):
+            fmt = FormatTemplate.compile(fmt)
+        name = fmt.render(self.sfo, f)
         name = re.sub(r'[\\/*?:<>"|%]', fill, name)
         return (f.parent / name).with_suffix(f.suffix.lower())
 
-    def print_info(self, fmt=None) -> None:
+    def print_info(self, fmt: Union[str, FormatTemplate, None] = None) -> None:
         r"""
         Print information about the current game set.
         Accepts a custom output formatting string with SFO parameter variable expansion support
@@ -93,17 +355,18 @@ class Game(object):
 
 
         .. seealso::
-            :meth:`.SfoFile.format`
+            :meth:`.SfoFile.format`, :class:`.FormatTemplate`
 
-        :param str fmt: Formatting string to use for output
+        :param fmt: Formatting string to use for output,
+                    or a template compiled with ``FormatTemplate(fmt, file_variables=True)`` to reuse across games
         """
         if fmt is not None:
+            if not isinstance(fmt, FormatTemplate):
+                fmt = FormatTemplate.compile(fmt, file_variables=True)
+            # Without file variables, the output is the same for every file
+            line = None if fmt.uses_path else fmt.render(self.sfo)
             for f in self.files:
-                print(self.sfo.format(fmt)
-                      .replace('\\n', '\n')
-                      .replace('\\t', '\t')
-                      .replace('%f', f.name)
-                      .replace('%p', str(f)))
+                print(fmt.render(self.sfo, f) if line is None else line)
         else:
             width = max(len(str(k)) for k, v in self.sfo)
             print(f'\n{self.iso}')
@@ -112,52 +375,227 @@ class Game(object):
     def __repr__(self):
         return f'<{self.iso}|+{max(0, len(self.files) - 1)}>'
 
+    def validate(self) -> List[str]:
+        """
+        Check the SFO data of the game, returning a description of every problem found.
+        Errors reading the image are reported as a problem rather than raised.
+
+        .. seealso:: :meth:`.SfoFile.validate`
+        """
+        try:
+            return self.sfo.validate()
+        except (OSError, IsoError, SfoParseError, subprocess.CalledProcessError) as ex:
+            return ['Unable to read SFO data: %s' % ex]
+
+    @staticmethod
+    def validate_all(games: Iterable[Game], jobs: Optional[int] = 1,
+                     ordered=True) -> Iterator[Tuple[Game, List[str]]]:
+        """
+        Validate many games concurrently, yielding each game with the problems found in it as soon as it is checked.
+        Invalid games do not stop the remaining games from being checked.
+
+        .. seealso:: :meth:`.validate`, :func:`.parallel_map`
+
+        :param games: Games to validate, e.g. from :meth:`.search` with the default ``jobs=1``
+        :param jobs: Number of images to read concurrently
+        :param ordered: Yield games in input order rather than as soon as they are checked
+        """
+        return parallel_map(lambda game: (game, game.validate()), games, jobs=jobs, ordered=ordered)
+
     @classmethod
-    def search(cls, path: Union[str, Path]) -> Iterator[Game]:
+    def search(cls, path: Union[str, Path], jobs: Optional[int] = 1, ordered=True,
+               cache: Optional[SfoCache] = None, recursive=False, max_depth: Optional[int] = None,
+               follow_symlinks=False, predicate: Optional[Callable[[Game], bool]] = None,
+               keys: Optional[Iterable[str]] = None) -> Iterator[Game]:
         """
-        Search for ``.iso`` files in the given path. Non-recursive and case-insensitive
+        Search for ``.iso`` files in the given path (case-insensitive).
+        Games are yielded as soon as they are found.
+
+        When reading serially, the SFO data of each game is only read when it is first accessed.
+        When reading concurrently, it is read by the worker threads before each game is yielded.
 
-        :param: Path to search
+        .. seealso:: :func:`.walk`, :func:`.parallel_map`
+
+        :param path: Path to search
+        :param jobs: Number of images to read concurrently
+        :param ordered: When reading concurrently, yield games in path order rather than as soon as they are read
+        :param cache: Look up and store SFO data in a persistent cache
+        :param recursive: Search subdirectories
+        :param max_depth: Maximum depth of subdirectories to search when recursive, unlimited by default
+        :param follow_symlinks: Follow symbolic links to directories
+        :param predicate: Only include games for which this returns True.
+                          It is called before any image is read, e.g. ``lambda game: game.size > 2**30``
+        :param keys: Only read these SFO parameters, e.g. ``SfoFile.format_keys(fmt)`` when only formatting output
         """
-        path = Path(path)
-        if path.resolve().is_dir():
-            for fpath in path.glob(r'*.[Ii][Ss][Oo]'):
-                yield cls(fpath)
+        games = cls._search(path, cache, recursive, max_depth, follow_symlinks, keys)
+        if predicate is not None:
+            games = filter(predicate, games)
+        if jobs is None or jobs <= 1:
+            yield from games
         else:
-            yield cls(path)
+            yield from parallel_map(cls.load, games, jobs=jobs, ordered=ordered)
+
+    @classmethod
+    async def asearch(cls, path: Union[str, Path], concurrency=8, timeout: Optional[float] = None,
+                      cache: Optional[SfoCache] = None, recursive=False, max_depth: Optional[int] = None,
+                      follow_symlinks=False, predicate: Optional[Callable[[Game], bool]] = None,
+                      keys: Optional[Iterable[str]] = None, errors='raise',
+                      on_error: Optional[Callable[[Game, Exception], None]] = None) -> AsyncIterator[Game]:
+        """
+        Asynchronous version of :meth:`.search`, yielding games as soon as they are read
+
+        Closing the iterator early cancels any reads which are still in progress.
+
+        :param path: Path to search
+        :param concurrency: Maximum number of images to read at the same time
+        :param timeout: Maximum number of seconds to spend reading each image, handled according to ``errors``
+        :param cache: Look up and store SFO data in a persistent cache
+        :param recursive: Search subdirectories
+        :param max_depth: Maximum depth of subdirectories to search when recursive, unlimited by default
+        :param follow_symlinks: Follow symbolic links to directories
+        :param predicate: Only include games for which this returns True, called before any image is read
+        :param keys: Only read these SFO parameters
+        :param errors: ``'raise'`` to raise an :class:`asyncio.TimeoutError` for the first image which times out,
+                       or ``'skip'`` to leave it out and carry on with the others
+        :param on_error: Called with the game and the exception for each image skipped
+        """
+        if errors not in ('raise', 'skip'):
+            raise ValueError('errors must be "raise" or "skip"')
+        loop = asyncio.get_running_loop()
+
+        async def load(game):
+            try:
+                sfo = cls.aextract_sfo(game.iso, cache=cache, stat=game._stat, keys=keys)
+                game.sfo = await asyncio.wait_for(sfo, timeout)
+            except asyncio.TimeoutError:
+                ex = asyncio.TimeoutError('Timed out reading %s' % game.iso)
+                if errors == 'raise':
+                    raise ex from None
+                if on_error is not None:
+                    on_error(game, ex)
+                return None
+            return game
+
+        games = cls._search(path, cache, recursive, max_depth, follow_symlinks, keys)
+        if predicate is not None:
+            games = filter(predicate, games)
+
+        def next_game():
+            game = next(games, None)
+            if game is not None and cache is not None and game._entry is not None:
+                game.stat
+            return game
+
+        pending = set()
+        done = []
+        try:
+            while True:
+                # Walk the directory tree in the executor, one entry at a time
+                game = await loop.run_in_executor(None, next_game)
+                if game is None:
+                    break
+                pending.add(asyncio.ensure_future(load(game)))
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    done = list(done)
+                    while done:
+                        game = done.pop().result()
+                        if game is not None:
+                            yield game
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                done = list(done)
+                while done:
+                    game = done.pop().result()
+                    if game is not None:
+                        yield game
+        finally:
+            # Retrieve the outcome of finished reads which will not be yielded, and cancel any still running
+            for task in done:
+                if not task.cancelled():
+                    task.exception()
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @classmethod
+    def _search(cls, path: Union[str, Path], cache: Optional[SfoCache] = None, recursive=False,
+                max_depth: Optional[int] = None, follow_symlinks=False,
+                keys: Optional[Iterable[str]] = None) -> Iterator[Game]:
+        # Yield a game for each image found, without reading anything from it
+        if not Path(path).resolve().is_dir():
+            yield cls(path, cache=cache, keys=keys)
+            return
+        for entry, index in walk(path, max_depth=max_depth if recursive else 0, follow_symlinks=follow_symlinks):
+            yield cls.from_entry(entry, index, cache=cache, keys=keys)
 
     @staticmethod
-    def rename_all(games: List[Game], fmt: str) -> int:
+    def rename_all(games: List[Game], fmt: Union[str, FormatTemplate], journal: Union[str, Path, None] = None,
+                   jobs: Optional[int] = 1) -> int:
         """
         Rename all files for the given games according to the formatting string
 
-        .. seealso:: :meth:`.SfoFile.format`
+        Renames are ordered with :func:`.plan_renames`, so files can take each other's names,
+        and no existing file is overwritten.
+        With a journal, the planned renames are recorded before any file is touched,
+        and the rename can be resumed or rolled back from it if it is interrupted.
+
+        .. seealso:: :meth:`.SfoFile.format`, :func:`.plan_renames`, :class:`.RenameJournal`
 
         :param games: List of games to rename
         :param fmt: Formatting string to use as file name template
+        :param journal: Path of a new journal file to record the renames in
+        :param jobs: Number of renames to run concurrently when journaled
+        :return: Number of files renamed, not counting moves to and from temporary names
         """
-        # Create a list of (src, dst) tuples
-        targets = set((f, game.format_file(f, fmt)) for game in games for f in game.files)
-        # Remove duplicates
-        counter = Counter(t[1] for t in targets)
-        duplicates = set(t for t in targets if counter[t[1]] != 1)
-        targets -= duplicates
+        if not isinstance(fmt, FormatTemplate):
+            fmt = FormatTemplate.compile(fmt)
+        # Order the (src, dst) renames, so chains and swaps of names do not overwrite each other
+        plan = plan_renames((f, game.format_file(f, fmt)) for game in games for f in game.files)
+        temporary = plan.temporary
+        moved = []
 
         def maxwidth(_targets):
             return max(len(str(t[0])) for t in _targets)
 
-        if targets:
-            width = maxwidth(targets)
-            for src, dst in sorted(targets, key=lambda x: x[0]):
-                print(f'{str(src).ljust(width)} -> {dst}')
-                src.rename(dst)
-        else:
+        def move_all():
+            failed = set()
+            for src, dst in plan.steps:
+                try:
+                    if src in failed or dst in failed:
+                        raise OSError('Skipped, an earlier rename of the same file failed')
+                    _move(src, dst)
+                except OSError as ex:
+                    failed.update((src, dst))
+                    yield src, dst, ex
+                else:
+                    yield src, dst, None
+
+        def record(results):
+            for src, dst, error in results:
+                if error is None:
+                    moved.append((src, dst))
+                yield src, dst, error
+
+        if not plan.steps:
             print('No rename targets found.')
+        elif journal is not None:
+            with RenameJournal.create(journal, plan.steps) as j:
+                print_results(record(j.run(jobs)))
+        else:
+            print_results(record(move_all()))
+
+        # A failed step out of a temporary name leaves the file there
+        left = {dst for src, dst in moved if dst in temporary} - {src for src, dst in moved}
+        if left:
+            print('\nFiles left at temporary names:')
+            for path in sorted(left):
+                print(f'\t{path}')
 
-        if duplicates:
-            print('\nCowardly refusing to rename files where duplicates would be overwritten:')
-            width = maxwidth(duplicates)
-            for src, dst in sorted(duplicates, key=lambda x: x[1]):
+        if plan.conflicts:
+            print('\nCowardly refusing to rename files where existing files would be overwritten:')
+            width = maxwidth(plan.conflicts)
+            for src, dst in plan.conflicts:
                 print(f'\t{str(src).ljust(width)} -> {dst}')
 
-        return len(targets)
+        return sum(dst not in temporary for src, dst in moved)
@@ -0,0 +1,325 @@
+from __future__ import annotations
+import os
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+
+SECTOR_SIZE = 2048
+
+
+class IsoError(Exception):
+    """Named Exception raised when an image cannot be read as an ISO9660 filesystem"""
+
+
+class IsoFileNotFoundError(IsoError):
+    """Named Exception raised when a path does not exist inside an ISO9660 image"""
+
+
+def _close_mapping(buffer: mmap.mmap) -> None:
+    # A mapping cannot be closed while views of it exist, it will be closed when the last one is released instead
+    try:
+        buffer.close()
+    except BufferError:
+        pass
+
+
+class IsoDirectoryRecord(object):
+    """
+    A single ISO9660 directory record, describing a file or directory extent
+
+    :param str name: Record identifier with any ``;1`` version suffix removed
+    :param int extent: Logical block address of the first sector of the extent
+    :param int size: Length of the extent data in bytes
+    :param bool is_dir: True if the record describes a directory
+    :param int offset: Position of the record itself in the image, if known
+    """
+
+    def __init__(self, name, extent, size, is_dir=False, offset=None):
+        self.name = name
+        self.extent = extent
+        self.size = size
+        self.is_dir = is_dir
+        self.offset = offset
+
+    @classmethod
+    def parse(cls, record_bytes, offset=None) -> IsoDirectoryRecord:
+        if len(record_bytes) < 34:
+            raise IsoError('Directory record must be at least 34 bytes long')
+        extent, size = struct.unpack_from('<I4xI', record_bytes, 2)
+        flags = record_bytes[25]
+        name_len = record_bytes[32]
+        name = bytes(record_bytes[33:33 + name_len])
+        if name == b'\0':
+            name = '.'
+        elif name == b'\1':
+            name = '..'
+        else:
+            name = name.decode('ascii', 'replace').split(';', 1)[0]
+        return cls(name=name, extent=extent, size=size, is_dir=bool(flags & 0x02), offset=offset)
+
+    @staticmethod
+    def pack_size(size: int) -> bytes:
+        """
+        Encode an extent length as stored in a directory record, at offset ``10``
+        """
+        return struct.pack('<I', size) + struct.pack('>I', size)
+
+    def __repr__(self):
+        return '%s(name=%r, extent=%d, size=%d, is_dir=%r)' % (
+            self.__class__.__name__, self.name, self.extent, self.size, self.is_dir)
+
+
+class IsoImage(object):
+    """
+    Minimal read-only ISO9660 reader, able to locate and read individual files
+    without listing or extracting the whole filesystem.
+
+    Image data is accessed through zero-copy :class:`memoryview` slices, so when
+    the image is opened with :meth:`.open` only the pages which are actually
+    touched are read from disk.
+
+    :param buffer: Image data, any object supporting the buffer protocol (e.g. :class:`mmap.mmap` or :class:`bytes`)
+
+    .. seealso::
+        :meth:`.open`
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._view = memoryview(buffer)
+        self.root, self._path_table_lba, self._path_table_size = self._read_primary_volume_descriptor()
+        self._path_table = []
+        self._path_table_data = b''
+        self._path_table_pos = 0
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> IsoImage:
+        """
+        Memory-map an image file for reading. The returned object should be used as a context manager
+
+        :param path: Path to an existing ``.iso`` file
+        """
+        with Path(path).open('rb') as f:
+            try:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as ex:
+                raise IsoError('Unable to map image %s: %s' % (path, ex)) from ex
+        try:
+            return cls(buffer)
+        except Exception:
+            _close_mapping(buffer)
+            raise
+
+    def close(self) -> None:
+        """
+        Release the image data. Views which are still referenced remain valid,
+        and the mapping is closed once the last of them is released.
+        """
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            _close_mapping(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def view(self, lba: int, length: int) -> memoryview:
+        """
+        Return a zero-copy view of ``length`` bytes starting at the given logical block address
+
+        :param lba: Logical block address
+        :param length: Number of bytes
+        """
+        start = lba * SECTOR_SIZE
+        if start + length > len(self._view):
+            raise IsoError('Unexpected end of image at sector %d' % lba)
+        return self._view[start:start + length]
+
+    def _read_primary_volume_descriptor(self):
+        lba = 16
+        while True:
+            sector = self.view(lba, SECTOR_SIZE)
+            if sector[1:6] != b'CD001':
+                raise IsoError('ISO9660 volume descriptor not found')
+            if sector[0] == 1:
+                block_size = struct.unpack_from('<H', sector, 128)[0]
+                if block_size != SECTOR_SIZE:
+                    raise IsoError('Unsupported logical block size: %d' % block_size)
+                path_table_size, path_table_lba = struct.unpack_from('<I4xI', sector, 132)
+                return IsoDirectoryRecord.parse(sector[156:190]), path_table_lba, path_table_size
+            if sector[0] == 255:
+                raise IsoError('Primary volume descriptor not found')
+            lba += 1
+
+    def _read_path_table_sector(self) -> bool:
+        # Read the next sector of the (little-endian) path table, and parse all complete entries from it
+        loaded = len(self._path_table_data)
+        if loaded >= self._path_table_size:
+            return False
+        length = min(SECTOR_SIZE, self._path_table_size - loaded)
+        self._path_table_data += bytes(self.view(self._path_table_lba + loaded // SECTOR_SIZE, length))
+        data, pos = self._path_table_data, self._path_table_pos
+        while pos + 8 <= len(data):
+            name_len = data[pos]
+            entry_len = 8 + name_len + (name_len & 1)
+            if name_len == 0 or pos + entry_len > len(data):
+                break
+            extent, parent = struct.unpack_from('<IH', data, pos + 2)
+            name = data[pos + 8:pos + 8 + name_len].decode('ascii', 'replace').upper()
+            self._path_table.append((len(self._path_table) + 1, parent, name, extent))
+            pos += entry_len
+        self._path_table_pos = pos
+        return True
+
+    def _path_table_entries(self) -> Iterator[tuple]:
+        # Yield (number, parent, name, extent) path table entries, reading sectors only as they are needed
+        n = 0
+        while True:
+            while n < len(self._path_table):
+                yield self._path_table[n]
+                n += 1
+            if not self._read_path_table_sector():
+                return
+
+    def _records(self, directory: IsoDirectoryRecord) -> Iterator[IsoDirectoryRecord]:
+        # Yield all records in a directory extent, one sector at a time
+        for n in range(-(-directory.size // SECTOR_SIZE)):
+            sector = self.view(directory.extent + n, min(SECTOR_SIZE, directory.size - n * SECTOR_SIZE))
+            pos = 0
+            # Records never span sectors, a zero length marks the padding at the end of a sector
+            while pos < len(sector) and sector[pos] != 0:
+                record_len = sector[pos]
+                offset = (directory.extent + n) * SECTOR_SIZE + pos
+                yield IsoDirectoryRecord.parse(sector[pos:pos + record_len], offset)
+                pos += record_len
+
+    def _find_record(self, directory: IsoDirectoryRecord, name: str) -> Optional[IsoDirectoryRecord]:
+        return next((r for r in self._records(directory) if r.name.upper() == name), None)
+
+    def _find_directory(self, parts) -> Optional[IsoDirectoryRecord]:
+        if not self._path_table_size:
+            directory = self.root
+            for part in parts:
+                directory = self._find_record(directory, part)
+                if directory is None or not directory.is_dir:
+                    return None
+            return directory
+
+        # Path table entries are ordered by parent directory number, so the search
+        # for each path component can stop as soon as the parent has been passed
+        number, extent = 1, self.root.extent
+        for part in parts:
+            for entry_number, parent, name, entry_extent in self._path_table_entries():
+                if parent > number:
+                    return None
+                if parent == number and entry_number != number and name == part:
+                    number, extent = entry_number, entry_extent
+                    break
+            else:
+                return None
+        if number == 1:
+            return self.root
+        # The path table does not record directory sizes, which are held by the '.' record
+        record = IsoDirectoryRecord.parse(self.view(extent, 34))
+        record.name = parts[-1]
+        return record
+
+    def listdir(self, directory: IsoDirectoryRecord) -> Iterator[IsoDirectoryRecord]:
+        """
+        Iterate over the records contained in a directory extent, excluding ``.`` and ``..``
+
+        :param directory: Directory record to list
+        """
+        return (r for r in self._records(directory) if r.name not in ('.', '..'))
+
+    def find(self, path: str) -> Optional[IsoDirectoryRecord]:
+        """
+        Find the record for a path inside the image, or ``None`` if it does not exist.
+        Names are compared case-insensitively, and version suffixes (``;1``) are ignored.
+
+        Only the path table and the records of the parent directory are read,
+        so the cost of a lookup does not depend on the size of the filesystem.
+
+        :param path: Absolute path inside the image, e.g. ``/PS3_GAME/PARAM.SFO``
+        """
+        parts = [p.upper() for p in path.split(';', 1)[0].split('/') if p]
+        if not parts:
+            return self.root
+        directory = self._find_directory(parts[:-1])
+        if directory is None:
+            return None
+        return self._find_record(directory, parts[-1])
+
+    def read_file(self, path: str) -> memoryview:
+        """
+        Return a zero-copy view of the contents of a file inside the image.
+        Raises an :class:`.IsoFileNotFoundError` if the path does not exist
+
+        :param path: Absolute path inside the image, e.g. ``/PS3_GAME/PARAM.SFO``
+        """
+        record = self.find(path)
+        if record is None or record.is_dir:
+            raise IsoFileNotFoundError(path)
+        return self.view(record.extent, record.size)
+
+
+_BACKUP_MAGIC = b'PS3ISOBK'
+
+
+def patch_image(path: Union[str, Path], writes: Iterable[Tuple[int, bytes]],
+                backup: Union[str, Path, None] = None) -> None:
+    """
+    Overwrite data at the given byte offsets of an image file, without rewriting the rest of the image.
+
+    If a backup path is given, every sector which will be touched is first saved to it,
+    so the change can be reverted with :func:`.restore_image`.
+
+    :param path: Path to the image file
+    :param writes: ``(offset, data)`` pairs to write
+    :param backup: Path to save the original sectors to
+    """
+    writes = list(writes)
+    with open(path, 'r+b') as f:
+        if backup is not None:
+            sectors = sorted({lba for offset, data in writes
+                              for lba in range(offset // SECTOR_SIZE, -(-(offset + len(data)) // SECTOR_SIZE))})
+            with open(backup, 'wb') as b:
+                b.write(_BACKUP_MAGIC)
+                for lba in sectors:
+                    f.seek(lba * SECTOR_SIZE)
+                    b.write(struct.pack('<Q', lba) + f.read(SECTOR_SIZE).ljust(SECTOR_SIZE, b'\0'))
+                b.flush()
+                os.fsync(b.fileno())
+        for offset, data in writes:
+            f.seek(offset)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def restore_image(path: Union[str, Path], backup: Union[str, Path]) -> None:
+    """
+    Write the sectors saved by :func:`.patch_image` back to the image file
+
+    :param path: Path to the image file
+    :param backup: Path to the backup created when patching
+    """
+    with open(backup, 'rb') as b:
+        if b.read(len(_BACKUP_MAGIC)) != _BACKUP_MAGIC:
+            raise IsoError('Not an image backup: %s' % backup)
+        entries = []
+        while True:
+            header = b.read(8)
+            if not header:
+                break
+            sector = b.read(SECTOR_SIZE)
+            if len(header) != 8 or len(sector) != SECTOR_SIZE:
+                raise IsoError('Truncated image backup: %s' % backup)
+            entries.append((struct.unpack('<Q', header)[0] * SECTOR_SIZE, sector))
+    size = os.stat(path).st_size
+    # Sectors saved past the end of the image were only padding, and are not restored
+    patch_image(path, ((offset, sector[:max(0, size - offset)]) for offset, sector in entries))
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import io
+import csv
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional, Sequence, TextIO, Tuple, Type
+
+from .game import Game
+from .sfo.format import SFO_FORMAT_VARIABLES, FormatTemplate
+
+
+DEFAULT_COLUMNS = tuple(SFO_FORMAT_VARIABLES.values())
+"""SFO parameters written by the column based formats when no formatting string is given"""
+
+
+class OutputWriter(ABC):
+    """
+    Abstract base class of the machine-readable output formats, writing one record per game.
+    Subclasses implement :meth:`._write_record`.
+
+    Records are collected in memory and written to the stream in batches, once ``batch_size`` records
+    are waiting or ``interval`` seconds have passed since the last write, so output is streamed
+    as games are found without buffering the whole library.
+    The writer should be used as a context manager, or closed to write any remaining records.
+
+    :param stream: Text stream to write to, e.g. :data:`sys.stdout`
+    :param columns: SFO parameters to include in each record. All parameters are included by default
+                    by formats which allow it, otherwise :data:`.DEFAULT_COLUMNS`
+    :param batch_size: Maximum number of records to hold before writing them
+    :param interval: Maximum number of seconds to hold records before writing them
+
+    .. seealso:: :data:`.OUTPUT_WRITERS`
+    """
+
+    def __init__(self, stream: TextIO, columns: Optional[Sequence[str]] = None, batch_size: int = 256,
+                 interval: float = 0.5):
+        self.stream = stream
+        self.columns: Optional[Tuple[str, ...]] = None if columns is None else tuple(columns)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer = io.StringIO()
+        self._pending = 0
+        self._flushed = time.monotonic()
+
+    @property
+    def keys(self) -> Optional[Sequence[str]]:
+        """
+        SFO parameters which will be read from each game, or ``None`` for all of them
+        """
+        return self.columns
+
+    def _parameters(self, game: Game) -> Dict[str, Any]:
+        params = game.sfo.parameters
+        if self.columns is None:
+            return params._asdict()
+        return {key: getattr(params, key, None) for key in self.columns}
+
+    @abstractmethod
+    def _write_record(self, game: Game) -> None:
+        """
+        Write the record of a game to the buffer
+        """
+
+    def write(self, game: Game) -> None:
+        """
+        Add a record for a game, writing the current batch if it is full
+
+        :param game: Game to write
+        """
+        self._write_record(game)
+        self._pending += 1
+        if self._pending >= self.batch_size or time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def write_all(self, games: Iterable[Game]) -> int:
+        """
+        Write a record for every game, as each one is yielded
+
+        :param games: Games to write, e.g. from :meth:`.Game.search`
+        :return: Number of records written
+        """
+        count = 0
+        for game in games:
+            self.write(game)
+            count += 1
+        return count
+
+    def flush(self) -> None:
+        """
+        Write all waiting records to the stream
+        """
+        if self._pending:
+            self.stream.write(self._buffer.getvalue())
+            self._buffer.seek(0)
+            self._buffer.truncate()
+            self._pending = 0
+        self.stream.flush()
+        self._flushed = time.monotonic()
+
+    def close(self) -> None:
+        """
+        Write any remaining records. The stream itself is left open
+        """
+        self.flush()
+
+    def __enter__(self) -> OutputWriter:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class JsonLinesWriter(OutputWriter):
+    """
+    Write a JSON object per line, holding the image path and its SFO parameters
+
+    :Example:
+
+    >>> import sys
+    >>> from ps3iso.sfo import SfoFile
+    >>> with JsonLinesWriter(sys.stdout, columns=['TITLE_ID', 'TITLE']) as writer:
+    ...     writer.write(Game.from_path('/isos/Game.iso', sfo=SfoFile.parse_file('tests/data/PARAM.SFO')))
+    {"path": "/isos/Game.iso", "TITLE_ID": "BLES00000", "TITLE": "Example PS3ISO Game Title"}
+
+    """
+
+    def _write_record(self, game: Game) -> None:
+        record = {'path': str(game.iso)}
+        record.update(self._parameters(game))
+        self._buffer.write(json.dumps(record, ensure_ascii=False))
+        self._buffer.write('\n')
+
+
+class CsvWriter(OutputWriter):
+    """
+    Write comma separated values, starting with a header row.
+    The first column holds the image path, followed by a column per SFO parameter,
+    left empty for games without the parameter.
+    """
+
+    delimiter = ','
+    columns: Tuple[str, ...]
+
+    def __init__(self, stream: TextIO, columns: Optional[Sequence[str]] = None, batch_size: int = 256,
+                 interval: float = 0.5):
+        super().__init__(stream, DEFAULT_COLUMNS if columns is None else columns, batch_size, interval)
+        self._writer = csv.writer(self._buffer, delimiter=self.delimiter, lineterminator='\n')
+        self._writer.writerow(('path',) + self.columns)
+        self._pending += 1
+
+    def _write_record(self, game: Game) -> None:
+        values = self._parameters(game)
+        self._writer.writerow([str(game.iso)] + ['' if values[key] is None else values[key] for key in self.columns])
+
+
+class TsvWriter(CsvWriter):
+    """
+    Write tab separated values, in the same layout as :class:`.CsvWriter`
+    """
+
+    delimiter = '\t'
+
+
+class NullWriter(OutputWriter):
+    """
+    Write the image path of each game followed by a NUL character, like ``find -print0``.
+    If a template is given, it is rendered for each game in place of the path.
+
+    :param template: Template to render for each game, with file variables expanded for the image path
+    """
+
+    def __init__(self, stream: TextIO, columns: Optional[Sequence[str]] = None, batch_size: int = 256,
+                 interval: float = 0.5, template: Optional[FormatTemplate] = None):
+        super().__init__(stream, columns, batch_size, interval)
+        self.template = template
+
+    @property
+    def keys(self) -> Optional[Sequence[str]]:
+        return () if self.template is None else tuple(self.template.keys)
+
+    def _write_record(self, game: Game) -> None:
+        self._buffer.write(str(game.iso) if self.template is None else self.template.render(game.sfo, game.iso))
+        self._buffer.write('\0')
+
+
+OUTPUT_WRITERS: Dict[str, Type[OutputWriter]] = {
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+    'tsv': TsvWriter,
+    'null': NullWriter,
+}
+"""Output writer class for each name accepted by ``--output``"""
+
+
+def open_writer(name: str, stream: TextIO, template: Optional[FormatTemplate] = None,
+                **kwargs: Any) -> OutputWriter:
+    """
+    Create the writer for an output format. With a template, the column based formats
+    only include the SFO parameters used by it, and the ``null`` format renders it for each game.
+
+    :param name: Output format, a key of :data:`.OUTPUT_WRITERS`
+    :param stream: Text stream to write to
+    :param template: Formatting template given by the user
+    :param kwargs: Further arguments for the writer, e.g. ``batch_size``
+    """
+    if name == 'null':
+        return NullWriter(stream, template=template, **kwargs)
+    columns = None if template is None else [key for key in DEFAULT_COLUMNS if key in template.keys]
+    return OUTPUT_WRITERS[name](stream, columns, **kwargs)
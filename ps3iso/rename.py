@@ -0,0 +1,361 @@
+from __future__ import annotations
+import os
+import json
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .scan import parallel_map
+
+
+class RenameJournalError(Exception):
+    """Named Exception raised when a rename journal cannot be read"""
+
+
+RenameResult = Tuple[Path, Path, Optional[OSError]]
+
+
+def _move(src: Path, dst: Path) -> None:
+    # Rename without ever replacing an existing file. A step which was carried out but not yet
+    # recorded in the journal (src gone, dst present) is treated as complete
+    if src == dst:
+        return
+    if not os.path.lexists(src) and os.path.lexists(dst):
+        return
+    if os.path.lexists(dst):
+        raise FileExistsError(17, 'Target already exists', str(dst))
+    os.rename(src, dst)
+
+
+class RenamePlan(NamedTuple):
+    """
+    Renames ordered by :func:`.plan_renames`
+    """
+
+    steps: List[Tuple[Path, Path]]
+    """``(src, dst)`` steps in the order they must be carried out, including moves through temporary names"""
+    conflicts: List[Tuple[Path, Path]]
+    """``(src, dst)`` renames which were refused, because another file has or would take the target name"""
+
+    @property
+    def temporary(self) -> Set[Path]:
+        """
+        Temporary names which files are moved through to break cycles of renames
+        """
+        # Every file is renamed once, so only a temporary name is a target before it is a source
+        targets: Set[Path] = set()
+        temporary = set()
+        for src, dst in self.steps:
+            if src in targets:
+                temporary.add(src)
+            targets.add(dst)
+        return temporary
+
+
+def _temporary_name(src: Path, taken) -> Path:
+    n = 0
+    while True:
+        tmp = src.with_name('.%s.ps3iso-%d' % (src.name, n))
+        if not taken(tmp):
+            return tmp
+        n += 1
+
+
+def plan_renames(renames: Iterable[Tuple[Union[str, Path], Union[str, Path]]]) -> RenamePlan:
+    """
+    Order a set of renames so that they can be carried out one after another without replacing any file.
+
+    Renames form chains, where the target of one is the source of another (``a -> b`` and ``b -> c``),
+    and cycles, like two files swapping names. The renames of a chain are ordered from its end,
+    so every target is free when it is renamed to, and each cycle is broken by first
+    moving one of its files to a temporary name in the same directory.
+
+    A rename is refused if its target is also the target of another rename, or is an existing file
+    which is not renamed itself. Each target directory is listed once, rather than checking every target.
+
+    :param renames: ``(src, dst)`` pairs, renames of a file to its own name are ignored
+    :return: The ordered steps, and any refused renames
+
+    :Example:
+
+    >>> plan = plan_renames([('/isos/a', '/isos/b'), ('/isos/b', '/isos/a'), ('/isos/c', '/isos/d'), ('/isos/e', '/isos/d')])
+    >>> [(src.name, dst.name) for src, dst in plan.steps]
+    [('a', '.a.ps3iso-0'), ('b', 'a'), ('.a.ps3iso-0', 'b')]
+    >>> [path.name for path in plan.temporary]
+    ['.a.ps3iso-0']
+    >>> [(src.name, dst.name) for src, dst in plan.conflicts]
+    [('c', 'd'), ('e', 'd')]
+
+    """
+    moves: Dict[Path, Path] = {}
+    targets: Dict[Path, List[Path]] = defaultdict(list)
+    for src, dst in renames:
+        src, dst = Path(src), Path(dst)
+        if src != dst and moves.setdefault(src, dst) == dst:
+            targets[dst].append(src)
+
+    listings: Dict[Path, Set[str]] = {}
+
+    def exists(path: Path) -> bool:
+        if path.parent not in listings:
+            try:
+                listings[path.parent] = set(os.listdir(path.parent))
+            except OSError:
+                listings[path.parent] = set()
+        return path.name in listings[path.parent]
+
+    conflicts = []
+    for dst, srcs in targets.items():
+        if len(srcs) > 1:
+            conflicts.extend((src, dst) for src in srcs)
+            for src in srcs:
+                del moves[src]
+    # A target is only free once its file is renamed, so refusing one rename can block those ending at its source
+    blocked = [src for src, dst in moves.items() if dst not in moves and exists(dst)]
+    while blocked:
+        src = blocked.pop()
+        conflicts.append((src, moves.pop(src)))
+        blocked.extend(s for s in targets.get(src, ()) if s in moves)
+
+    steps = []
+    done: Set[Path] = set()
+    for start in sorted(moves):
+        if start in done:
+            continue
+        chain = []
+        src = start
+        while src in moves and src not in done:
+            done.add(src)
+            chain.append(src)
+            src = moves[src]
+        if src == start:
+            # Every target is unique, so a chain can only return to its start
+            tmp = _temporary_name(start, lambda p: exists(p) or p in moves)
+            steps.append((start, tmp))
+            steps.extend((s, moves[s]) for s in reversed(chain[1:]))
+            steps.append((tmp, moves[start]))
+        else:
+            steps.extend((s, moves[s]) for s in reversed(chain))
+    return RenamePlan(steps, sorted(conflicts, key=lambda x: (x[1], x[0])))
+
+
+def _waves(steps: List[Tuple[Path, Path]]) -> List[List[int]]:
+    # Group steps so that each one only runs after every earlier step using either of its paths
+    waves: List[List[int]] = []
+    last: Dict[Path, int] = {}
+    for n, (src, dst) in enumerate(steps):
+        wave = max(last.get(src, -1), last.get(dst, -1)) + 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(n)
+        last[src] = last[dst] = wave
+    return waves
+
+
+class RenameJournal(object):
+    """
+    Append-only journal of a bulk rename, so that an interrupted rename can be resumed or rolled back
+    without scanning the library or reading any SFO data again.
+
+    The journal is a JSON Lines file. It starts with every planned ``(src, dst)`` step,
+    followed by a checkpoint line as each step is completed (or reverted by a rollback).
+    Running a journal is idempotent: steps which were carried out before an interruption but not
+    recorded are detected from the file system, and no step ever replaces an existing file.
+
+    :param path: Journal file
+    :param steps: Planned ``(src, dst)`` renames, in order
+    :param checkpoint: Number of completed steps between each :func:`os.fsync` of the journal
+
+    .. seealso:: :meth:`.create`, :meth:`.load`
+
+    :Example:
+
+    >>> import tempfile
+    >>> directory = Path(tempfile.mkdtemp())
+    >>> (directory / 'a.iso').touch()
+    >>> with RenameJournal.create(directory / 'journal.jsonl', [(directory / 'a.iso', directory / 'b.iso')]) as journal:
+    ...     [error for src, dst, error in journal.run()]
+    [None]
+    >>> sorted(p.name for p in directory.glob('*.iso'))
+    ['b.iso']
+    >>> with RenameJournal.load(directory / 'journal.jsonl') as journal:
+    ...     [error for src, dst, error in journal.rollback()]
+    [None]
+    >>> sorted(p.name for p in directory.glob('*.iso'))
+    ['a.iso']
+
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Union[str, Path], steps: List[Tuple[Path, Path]], checkpoint=64):
+        self.path = Path(path)
+        self.steps = steps
+        self.checkpoint = checkpoint
+        self.completed: Set[int] = set()
+        self._file = None
+        self._unsynced = 0
+
+    @classmethod
+    def create(cls, path: Union[str, Path], renames: Iterable[Tuple[Union[str, Path], Union[str, Path]]],
+               checkpoint=64) -> RenameJournal:
+        """
+        Write a new journal of planned renames. An existing journal is never replaced.
+
+        :param path: Journal file to create
+        :param renames: ``(src, dst)`` pairs, carried out in this order
+        :param checkpoint: Number of completed steps between each :func:`os.fsync` of the journal
+        """
+        journal = cls(path, [(Path(src), Path(dst)) for src, dst in renames], checkpoint)
+        journal._file = open(path, 'x', encoding='utf8')
+        journal._append({'version': cls.VERSION, 'steps': len(journal.steps)})
+        for n, (src, dst) in enumerate(journal.steps):
+            journal._append({'step': n, 'src': str(src), 'dst': str(dst)})
+        journal._sync()
+        return journal
+
+    @classmethod
+    def load(cls, path: Union[str, Path], checkpoint=64) -> RenameJournal:
+        """
+        Read an existing journal, to resume or roll back the renames it describes
+
+        :param path: Journal file
+        :param checkpoint: Number of completed steps between each :func:`os.fsync` of the journal
+        """
+        journal = cls(path, [], checkpoint)
+        with open(path, 'r+b') as f:
+            data = f.read()
+            # A line is only incomplete if the process was killed while writing it, and is discarded
+            complete = data[:data.rfind(b'\n') + 1]
+            if len(complete) != len(data):
+                f.truncate(len(complete))
+        planned = None
+        for n, line in enumerate(complete.decode('utf8').splitlines()):
+            try:
+                entry = json.loads(line)
+                if n == 0:
+                    if entry.get('version') != cls.VERSION:
+                        raise RenameJournalError('Unsupported rename journal version: %s' % path)
+                    planned = entry['steps']
+                elif 'step' in entry:
+                    journal.steps.append((Path(entry['src']), Path(entry['dst'])))
+                elif 'done' in entry:
+                    journal.completed.add(entry['done'])
+                elif 'undone' in entry:
+                    journal.completed.discard(entry['undone'])
+            except (ValueError, KeyError, AttributeError) as ex:
+                raise RenameJournalError('Invalid rename journal %s at line %d' % (path, n + 1)) from ex
+        if planned is None or len(journal.steps) != planned:
+            # The plan is written before any file is renamed, so nothing needs to be resumed
+            raise RenameJournalError('Incomplete rename journal: %s' % path)
+        journal._file = open(path, 'a', encoding='utf8')
+        return journal
+
+    def _append(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry) + '\n')
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _checkpoint(self, entry: dict) -> None:
+        self._append(entry)
+        self._unsynced += 1
+        if self._unsynced >= self.checkpoint:
+            self._sync()
+        else:
+            self._file.flush()
+
+    @property
+    def pending(self) -> List[int]:
+        """
+        Numbers of the steps which have not been completed
+        """
+        return [n for n in range(len(self.steps)) if n not in self.completed]
+
+    def _execute(self, steps: List[int], reverse: bool, jobs: Optional[int]) -> Iterator[RenameResult]:
+        pairs = [self.steps[n][::-1] if reverse else self.steps[n] for n in steps]
+        failed: Set[Path] = set()
+
+        def apply(i):
+            src, dst = pairs[i]
+            try:
+                if src in failed or dst in failed:
+                    raise OSError('Skipped, an earlier rename of the same file failed')
+                _move(src, dst)
+            except OSError as ex:
+                return i, ex
+            return i, None
+
+        try:
+            # Steps sharing a path, like the moves through a temporary name, run one after another
+            for wave in _waves(pairs):
+                for i, error in parallel_map(apply, wave, jobs=jobs, ordered=False):
+                    n = steps[i]
+                    if error is None:
+                        if reverse:
+                            self.completed.discard(n)
+                            self._checkpoint({'undone': n})
+                        else:
+                            self.completed.add(n)
+                            self._checkpoint({'done': n})
+                    else:
+                        failed.update(pairs[i])
+                    yield pairs[i][0], pairs[i][1], error
+        finally:
+            self._sync()
+
+    def run(self, jobs: Optional[int] = 1) -> Iterator[RenameResult]:
+        """
+        Carry out every pending step, yielding ``(src, dst, error)`` as each one finishes.
+        Failed steps are reported with the :class:`OSError` raised, and remain pending.
+
+        :param jobs: Number of renames to run concurrently, e.g. on high-latency network filesystems
+        """
+        return self._execute(self.pending, False, jobs)
+
+    def rollback(self, jobs: Optional[int] = 1) -> Iterator[RenameResult]:
+        """
+        Revert every completed step, in reverse order, yielding ``(src, dst, error)`` as each one finishes.
+        Failed steps are reported with the :class:`OSError` raised, and remain completed.
+
+        :param jobs: Number of renames to run concurrently
+        """
+        return self._execute(sorted(self.completed, reverse=True), True, jobs)
+
+    def close(self) -> None:
+        """
+        Write all checkpoints to disk and close the journal
+        """
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return '<%s %s steps=%d completed=%d>' % (
+            type(self).__name__, self.path, len(self.steps), len(self.completed))
+
+
+def print_results(results: Iterable[RenameResult]) -> int:
+    """
+    Print each rename as it finishes, along with the reason for any failure
+
+    :param results: ``(src, dst, error)`` results, from :meth:`.RenameJournal.run` or :meth:`.RenameJournal.rollback`
+    :return: Number of failed renames
+    """
+    failed = 0
+    for src, dst, error in results:
+        if error is None:
+            print(f'{src} -> {dst}')
+        else:
+            failed += 1
+            print(f'{src} -> {dst}: failed, {error.strerror or error}')
+    return failed
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import os
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def parallel_map(fn: Callable[[T], R], iterable: Iterable[T], jobs: Optional[int] = 1, ordered=True) -> Iterator[R]:
+    """
+    Lazily apply ``fn`` to every item using a pool of worker threads.
+
+    Items are only taken from ``iterable`` as workers become available, so results start
+    arriving before a slow (e.g. network backed) input has been exhausted.
+    Exceptions raised by ``fn`` are re-raised when the corresponding result is reached.
+
+    :param fn: Function to call for each item
+    :param iterable: Input items
+    :param jobs: Number of worker threads. With ``None`` or ``1``, items are processed serially in the calling thread
+    :param ordered: Yield results in input order, otherwise in order of completion
+
+    :Example:
+
+    >>> list(parallel_map(len, ['a', 'bb', 'ccc'], jobs=2))
+    [1, 2, 3]
+
+    """
+    if jobs is None or jobs <= 1:
+        yield from map(fn, iterable)
+        return
+
+    window = jobs * 2
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    pending = deque() if ordered else set()
+    try:
+        for item in iterable:
+            future = pool.submit(fn, item)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        if ordered:
+            while pending:
+                yield pending.popleft().result()
+        else:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        # Don't start any queued work if the consumer stopped early or an error occurred
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+class DirectoryIndex(object):
+    """
+    Index of the file names in a single directory, by every prefix which is followed by a ``.``
+
+    Looking up the files sharing a stem is equivalent to ``glob(escape(stem) + '.*')``,
+    without listing the directory again.
+
+    :param names: Names of the entries in the directory
+
+    :Example:
+
+    >>> index = DirectoryIndex(['Game.iso', 'Game.iso.md5', 'Game.png', 'Game 2.iso'])
+    >>> index.companions('Game')
+    ['Game.iso', 'Game.iso.md5', 'Game.png']
+
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self._index = defaultdict(list)
+        for name in names:
+            pos = name.find('.', 1)
+            while pos != -1:
+                self._index[name[:pos]].append(name)
+                pos = name.find('.', pos + 1)
+
+    def companions(self, stem: str) -> List[str]:
+        """
+        Names of all entries starting with ``stem`` followed by a ``.``
+
+        :param stem: File name without extension
+        """
+        return list(self._index.get(stem, ()))
+
+
+def walk(path: Union[str, Path], suffix='.iso', max_depth: Optional[int] = 0,
+         follow_symlinks=False) -> Iterator[Tuple[os.DirEntry, DirectoryIndex]]:
+    """
+    Find files with the given suffix (case-insensitive) in a directory tree, using :func:`os.scandir`.
+
+    Entries are yielded as soon as they are found, in sorted order within each directory,
+    with the files of a directory before the contents of its subdirectories.
+    The yielded :class:`os.DirEntry` objects cache their file type and stat data,
+    so no further system calls are needed to get the size or identity of each file.
+    Each directory is listed once, and every entry is yielded along with a
+    :class:`.DirectoryIndex` of its directory for finding related files.
+    Subdirectories which cannot be read are skipped.
+
+    :param path: Directory to search
+    :param suffix: File name suffix to match
+    :param max_depth: Maximum depth of subdirectories to search, ``0`` for only the given directory,
+                      or ``None`` for no limit
+    :param follow_symlinks: Follow symbolic links to directories. Symbolic links to matching files are always yielded
+
+    :Example:
+
+    >>> [entry.name for entry, index in walk('tests', suffix='.sfo', max_depth=None)]
+    ['PARAM.SFO']
+
+    """
+    suffix = suffix.lower()
+    visited = set()
+    if follow_symlinks:
+        st = os.stat(path)
+        visited.add((st.st_dev, st.st_ino))
+    stack = [(os.fspath(path), 0)]
+    while stack:
+        directory, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            if depth == 0:
+                raise
+            continue
+
+        index = None
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=follow_symlinks):
+                    if max_depth is None or depth < max_depth:
+                        subdirs.append(entry)
+                elif entry.name.lower().endswith(suffix) and entry.is_file():
+                    if index is None:
+                        index = DirectoryIndex(e.name for e in entries)
+                    yield entry, index
+            except OSError:
+                continue
+
+        for entry in reversed(subdirs):
+            if follow_symlinks:
+                # Avoid descending into the same directory twice through symlink loops
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) in visited:
+                    continue
+                visited.add((st.st_dev, st.st_ino))
+            stack.append((entry.path, depth + 1))
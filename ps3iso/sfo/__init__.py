@@ -1,2 +1,7 @@
 from .file import SfoFile
-from .parameters import SfoParameter, SfoParameterFormat, SfoCategory, VALID_SFO_PARAMETERS
+from .parameters import (
+    SfoParameter, SfoParameters, SfoParameterFormat, SfoCategory, VALID_SFO_PARAMETERS, SFO_PARAMETER_REGISTRY,
+    SFO_REQUIRED_PARAMETERS, SFO_OPTIONAL_PARAMETERS)
+from .format import SFO_FORMAT_VARIABLES, FormatTemplate
+from .table import SfoTable
+from .validate import validate_parameters
@@ -1,6 +1,5 @@
 from __future__ import annotations
 import struct
-from collections import UserList
 
 from .parameters import SfoParameterFormat
 from .errors import SfoHeaderParseError, SfoIndexTableEntryParseError, SfoIndexTableParseError, SfoParseError
@@ -12,6 +11,8 @@ class SfoHeader(object):
 
     size = 20
 
+    __slots__ = ('magic', 'version', 'key_table_start', 'data_table_start', 'table_entries')
+
     def __init__(self, magic=SFO_HEADER_MAGIC, version=(1, 1), key_table_start=20, data_table_start=0, table_entries=0):
         self.magic = magic
         self.version = version
@@ -51,13 +52,15 @@ class SfoHeader(object):
     def __eq__(self, other):
         if not isinstance(other, SfoHeader):
             return False
-        return self.__dict__ == other.__dict__
+        return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
 
 
 class SfoIndexTableEntry(object):
 
     size = 16
 
+    __slots__ = ('key_offset', 'data_fmt', 'data_len', 'data_max_len', 'data_offset')
+
     def __init__(self, key_offset=0, data_fmt=SfoParameterFormat.utf8, data_len=0, data_max_len=0, data_offset=0):
         self.key_offset = key_offset
         self.data_fmt = data_fmt
@@ -92,14 +95,47 @@ class SfoIndexTableEntry(object):
     def __eq__(self, other):
         if not isinstance(other, SfoIndexTableEntry):
             return False
-        return self.__dict__ == other.__dict__
+        return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+
+
+_ENTRY_STRUCT = struct.Struct("<2H3I")
 
 
 # noinspection PyProtectedMember
-class SfoIndexTable(UserList):
+class SfoIndexTable(object):
+    """
+    The index table of an SFO file, stored in its packed binary form.
+
+    Entries are unpacked into :class:`.SfoIndexTableEntry` objects only when they are accessed,
+    and :meth:`.records` iterates over the raw field values without creating any objects.
+
+    Each accessed entry is a copy, so changing its attributes does not change the table.
+    A changed entry must be assigned back to its position, which packs it into the table again.
+
+    :param entries: Initial :class:`.SfoIndexTableEntry` objects
+
+    :Example:
+
+    >>> table = SfoIndexTable([SfoIndexTableEntry(data_len=4)])
+    >>> entry = table[0]
+    >>> entry.data_len = 8
+    >>> table[0].data_len
+    4
+    >>> table[0] = entry
+    >>> table[0].data_len
+    8
+    """
+
+    __slots__ = ('_data',)
+
+    def __init__(self, entries=()):
+        self._data = bytearray()
+        for entry in entries:
+            self.append(entry)
+
     @property
     def size(self):
-        return len(self) * SfoIndexTableEntry.size
+        return len(self._data)
 
     @classmethod
     def parse(cls, table_bytes, table_entries):
@@ -107,31 +143,88 @@ class SfoIndexTable(UserList):
         if len(table_bytes) != table_entries * entry_size:
             raise SfoIndexTableParseError('Index Table data must be (table_entries * 16) bytes long)')
         tbl = cls()
-        for n in range(table_entries):
-            entry = SfoIndexTableEntry.parse(table_bytes[(n * entry_size):(n + 1) * entry_size])
-            tbl.append(entry)
+        tbl._data[:] = table_bytes
+        # Check the format of every entry up front, as if the entries had been unpacked
+        for record in tbl.records():
+            SfoParameterFormat.from_bytes(record[1].to_bytes(2, 'little'))
         return tbl
 
     @classmethod
     def build(cls, parameters) -> SfoIndexTable:
+        return cls.layout(
+            (key, int.from_bytes(bytes(value.fmt), 'little'), value.size, value.maxlength)
+            for key, value in ((key, getattr(parameters, key)) for key in sorted(getattr(parameters, '_fields', []))))
+
+    @classmethod
+    def layout(cls, entries) -> SfoIndexTable:
+        """
+        Build a table from ``(key, data_fmt, data_len, data_max_len)`` tuples, sorted by key,
+        placing each key and value directly after the previous one
+        """
         table = cls()
         data_offset = 0
         key_offset = 0
-        for key in sorted(getattr(parameters, '_fields', [])):
-            value = getattr(parameters, key)  # type: SfoParameter
-            table.append(SfoIndexTableEntry(
-                key_offset=key_offset,
-                data_offset=data_offset,
-                data_fmt=value.fmt,
-                data_len=value.size,
-                data_max_len=value.maxlength
-            ))
-            data_offset += value.maxlength
+        for key, data_fmt, data_len, data_max_len in entries:
+            table._data += _ENTRY_STRUCT.pack(key_offset, data_fmt, data_len, data_max_len, data_offset)
+            data_offset += data_max_len
             key_offset += len(bytes(key, 'utf8')) + 1
         return table
 
+    def records(self):
+        """
+        Iterate over ``(key_offset, data_fmt, data_len, data_max_len, data_offset)`` tuples,
+        where ``data_fmt`` is the raw 16-bit format code
+        """
+        return _ENTRY_STRUCT.iter_unpack(self._data)
+
+    def append(self, entry: SfoIndexTableEntry) -> None:
+        self._data += bytes(entry)
+
+    def extend(self, entries) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def insert(self, index: int, entry: SfoIndexTableEntry) -> None:
+        # Positions are clamped like list.insert
+        n = min(max(index + len(self) if index < 0 else index, 0), len(self))
+        self._data[n * SfoIndexTableEntry.size:n * SfoIndexTableEntry.size] = bytes(entry)
+
+    def __len__(self):
+        return len(self._data) // SfoIndexTableEntry.size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return type(self)(list(self)[item])
+        n = range(len(self))[item]
+        return SfoIndexTableEntry.parse(bytes(self._data[n * SfoIndexTableEntry.size:(n + 1) * SfoIndexTableEntry.size]))
+
+    def __setitem__(self, item, value):
+        if isinstance(item, slice):
+            entries = list(self)
+            entries[item] = value
+            self._data[:] = b''.join(map(bytes, entries))
+            return
+        n = range(len(self))[item]
+        self._data[n * SfoIndexTableEntry.size:(n + 1) * SfoIndexTableEntry.size] = bytes(value)
+
+    def __delitem__(self, item):
+        entries = list(self)
+        del entries[item]
+        self._data[:] = b''.join(map(bytes, entries))
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def __eq__(self, other):
+        if isinstance(other, SfoIndexTable):
+            return self._data == other._data
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
     def __bytes__(self):
-        return b''.join(map(bytes, self))
+        return bytes(self._data)
 
     def __repr__(self):
         return '%s([\n    %s\n])' % (self.__class__.__name__, ',\n    '.join(map(str, self)))
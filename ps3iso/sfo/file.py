@@ -1,17 +1,22 @@
 from __future__ import annotations
+import os
+import mmap
 import struct
-from collections import namedtuple
 from pathlib import Path
-from typing import BinaryIO, NamedTuple, List, Union
+from typing import BinaryIO, Iterable, List, Optional, Set, Tuple, Union
 
 from .parameters import (
     SfoCategory,
     SfoParameter,
+    SfoParameters,
     SfoParameterFormat,
-    VALID_SFO_PARAMETERS,
+    SFO_PARAMETER_REGISTRY,
+    SFO_REQUIRED_PARAMETERS,
     SfoUnknownParameterError)
+from .validate import validate_parameters
+from .format import FormatTemplate
 
-from ._file import SfoHeader, SfoIndexTable
+from ._file import SfoHeader, SfoIndexTable, SfoIndexTableEntry
 from .errors import (
     SfoParameterNotFoundError,
     SfoMissingParameterError,
@@ -23,13 +28,16 @@ from .errors import (
 )
 
 
+_INT32_FORMAT = int.from_bytes(bytes(SfoParameterFormat.int32), 'little')
+
+
 # noinspection PyProtectedMember
 class SfoFile(object):
     """
     The main object representing an SFO file.
 
     Use the :meth:`.parse_file` method to create an object from an existing file,
-    or use :meth:`.parse` directly on a seekable object such as :class:`io.BytesIO`
+    or use :meth:`.parse` directly on a buffer or a binary stream such as :class:`io.BytesIO`
 
     >>> sfo = SfoFile.parse_file('tests/data/PARAM.SFO')
     >>> sfo
@@ -62,28 +70,78 @@ class SfoFile(object):
     def __init__(self):
         self.header = SfoHeader()
         self.index_table = SfoIndexTable()
-        self._parameters = namedtuple('SfoParameters', [])()
+        self._parameters = SfoParameters()
+        self._layout_changed()
+
+    def _layout_changed(self):
+        # Discard the serialized key and data tables, after parameters have been added or removed
+        self._key_block = None
+        self._data_block = None
+        self._data_slots = None
 
     def _update_index(self):
         self.index_table = SfoIndexTable.build(self._parameters)
+        self._update_header()
+
+    def _update_header(self):
         self.header.table_entries = len(self.index_table)
         self.header.key_table_start = self.header.size + self.index_table.size
-        self.header.data_table_start = self.header.size + self.index_table.size + len(self._key_table() + self._padding())
+        self.header.data_table_start = self.header.key_table_start + len(self._key_table()) + len(self._padding())
 
-    def _key_table(self):
-        return b''.join((x.encode('utf8') + b'\0' for x in self.keys))
+    def _key_table(self) -> bytes:
+        if self._key_block is None:
+            self._key_block = b''.join((x.encode('utf8') + b'\0' for x in self.keys))
+        return self._key_block
 
     def _padding(self) -> bytes:
-        header_len = len(bytes(self.header) + bytes(self.index_table) + self._key_table())
+        header_len = self.header.size + self.index_table.size + len(self._key_table())
         return bytes((4 - (header_len % 4) % 4))
 
+    def _data_table(self) -> bytearray:
+        # The data table is serialized once, then only the slots of parameters whose value changed are rewritten
+        if self._data_block is not None:
+            for slot in self._data_slots:
+                param, offset, length, value = slot
+                if param.value != value:
+                    b = bytes(param)
+                    if len(b) != length:
+                        self._data_block = None
+                        break
+                    self._data_block[offset:offset + length] = b
+                    slot[3] = param.value
+        if self._data_block is None:
+            block = bytearray()
+            slots = []
+            for param in map(self._parameters._get, sorted(self._parameters._fields)):
+                b = bytes(param)
+                slots.append([param, len(block), len(b), param.value])
+                block += b
+            # Data table is followed by a LF
+            block.append(0x0a)
+            self._data_block, self._data_slots = block, slots
+        return self._data_block
+
 
     @classmethod
-    def parse(cls, fp: BinaryIO) -> SfoFile:
+    def parse(cls, fp: Union[BinaryIO, bytes, bytearray, memoryview, mmap.mmap], lazy=False,
+              keys: Optional[Iterable[str]] = None) -> SfoFile:
         """
-        Read a seekable binary IO stream containing an SFO file's bytes
+        Parse an SFO file from a buffer such as :class:`bytes`, :class:`memoryview` or :class:`mmap.mmap`,
+        or from a binary IO stream, which is read to the end in a single call
+
+        Values are decoded directly from the buffer, without copying the data into intermediate objects.
+
+        With ``lazy=True``, only the header, index table and keys are read up front. Each value is decoded
+        and validated when it is first accessed, so the buffer must stay valid until then,
+        and an invalid value raises an :class:`.SfoParseError` on access instead.
 
-        :param fp: Stream or resource pointer
+        With ``keys``, only the given parameters are read, and any others (including unknown ones) are skipped.
+        Parsing stops as soon as all of them have been found, and the index table is rebuilt to describe
+        only the parameters which were read.
+
+        :param fp: Buffer, or stream positioned at the start of the SFO data
+        :param lazy: Decode parameter values on first access
+        :param keys: Only read these parameters
         :rtype: SfoFile
 
         :Example:
@@ -93,47 +151,92 @@ class SfoFile(object):
         >>> print(sfo)
         <SfoFile parameters=12 size=1041>
 
+        >>> from pathlib import Path
+        >>> sfo = SfoFile.parse(Path('tests/data/PARAM.SFO').read_bytes(), lazy=True)
+        >>> sfo.parameters.TITLE_ID
+        'BLES00000'
+
+        >>> SfoFile.parse(Path('tests/data/PARAM.SFO').read_bytes(), keys={'TITLE_ID', 'VERSION'}).parameters
+        SfoParameters(TITLE_ID='BLES00000', VERSION='01.00')
+
         """
+        wanted = None if keys is None else set(keys)
+        data = fp.read() if hasattr(fp, 'read') else fp
+        # bytes, bytearray and mmap objects can be searched for key terminators directly
+        if not isinstance(data, (bytes, bytearray, mmap.mmap)):
+            data = bytes(data)
+        view = memoryview(data)
         try:
             sfo = SfoFile()
-            sfo.header = SfoHeader.parse(fp.read(20))
-            index_len = 16 * sfo.header.table_entries
-            sfo.index_table = SfoIndexTable.parse(fp.read(index_len), sfo.header.table_entries)
+            sfo.header = SfoHeader.parse(view[:SfoHeader.size])
+            index_end = SfoHeader.size + SfoIndexTableEntry.size * sfo.header.table_entries
+            sfo.index_table = SfoIndexTable.parse(view[SfoHeader.size:index_end], sfo.header.table_entries)
 
-            parameters = {}
+            key_table_start = sfo.header.key_table_start
+            data_table_start = sfo.header.data_table_start
+            records = {}
+            entries = {}
 
-            for record in sfo.index_table:
+            for key_offset, data_fmt, data_len, data_max_len, data_offset in sfo.index_table.records():
 
                 # Key is always a null-terminated string
-                fp.seek(sfo.header.key_table_start + record.key_offset)
-                c = b''
-                s = b''
-                while c != b'\0':
-                    s += c
-                    c = fp.read(1)
-                key = s.decode('utf8')
+                key_start = key_table_start + key_offset
+                key_end = data.find(b'\0', key_start)
+                if key_end == -1:
+                    raise SfoParseError('Unterminated key at offset %d' % key_start)
+                try:
+                    key = str(view[key_start:key_end], 'utf8')
+                except UnicodeDecodeError as ex:
+                    raise SfoParseError('An invalid key was encountered at offset %d' % key_start) from ex
+                if wanted is not None and key not in wanted:
+                    continue
+                # Use the prototype's name where there is one, shared by every parsed file
+                prototype = SFO_PARAMETER_REGISTRY.get(key)
+                if prototype is not None:
+                    key = prototype.name
 
                 # Value length (data_len)
-                fp.seek(sfo.header.data_table_start + record.data_offset)
-                value = fp.read(record.data_len)
-
-                # Value type (data_fmt)
-                if record.data_fmt == SfoParameterFormat.int32:
-                    value = struct.unpack("<I", value)[0]
-                else:
-                    value = value.decode('utf8').rstrip('\x00')
-
-                parameters[key] = SfoParameter.new(key, value)
-
-            # Create a new named tuple for the internal parameters attribute
-            param_nt = namedtuple('SfoParameters', sorted(parameters))
-            sfo._parameters = param_nt(**parameters)
+                value_start = data_table_start + data_offset
+                value_end = value_start + data_len
+                if value_end > len(view):
+                    raise SfoParseError('Value of %s extends past the end of the data' % key)
+
+                if wanted is not None:
+                    # Written back with the prototype's length, as after loading the value
+                    max_len = data_max_len if prototype is None else prototype.maxlength
+                    entries[key] = (key, data_fmt, min(data_len, max_len), max_len)
+                records[key] = (data_fmt, value_start, value_end)
+                if wanted is not None and len(records) == len(wanted):
+                    break
+
+            def load(name):
+                data_fmt, value_start, value_end = records[name]
+                try:
+                    # Value type (data_fmt)
+                    if data_fmt == _INT32_FORMAT:
+                        if value_start + 4 > len(view):
+                            raise SfoParseError('Value of %s extends past the end of the data' % name)
+                        value = struct.unpack_from("<I", view, value_start)[0]
+                    else:
+                        value = str(view[value_start:value_end], 'utf8').rstrip('\x00')
+                    return SfoParameter.new(name, value)
+                except SfoUnknownParameterError as ex:
+                    raise SfoParseError('An invalid parameter was encountered (%s)' % str(ex)) from ex
+                except UnicodeDecodeError as ex:
+                    raise SfoParseError('An invalid value was encountered for %s' % name) from ex
+
+            if lazy:
+                sfo._parameters = SfoParameters.lazy(sorted(records), load)
+            else:
+                sfo._parameters = SfoParameters((name, load(name)) for name in sorted(records))
+            if wanted is not None:
+                # The original index describes parameters which were skipped. The new one is built from the
+                # entries which were read, so no value is decoded before it is accessed
+                sfo.index_table = SfoIndexTable.layout(entries[name] for name in sorted(records))
+                sfo._update_header()
 
             return sfo
 
-        except SfoUnknownParameterError as ex:
-            raise SfoParseError('An invalid parameter was encountered (%s)' % str(ex)) from ex
-
         except SfoHeaderParseError as ex:
             raise SfoParseError('An invalid SFO header was encountered') from ex
 
@@ -180,15 +283,15 @@ class SfoFile(object):
         ['APP_VER', 'ATTRIBUTE', 'BOOTABLE', 'CATEGORY', 'LICENSE', 'PARENTAL_LEVEL', 'PS3_SYSTEM_VER', 'RESOLUTION', 'SOUND_FORMAT', 'TITLE', 'TITLE_ID', 'VERSION']
 
         """
-        return sorted(self._parameters._asdict().keys())
+        return sorted(self._parameters._fields)
 
 
     @property
-    def parameters(self) -> NamedTuple:
+    def parameters(self) -> SfoParameters:
         """
-        NamedTuple of all SFO parameter values
+        :class:`.SfoParameters` of all SFO parameter values
 
-        :rtype: NamedTuple
+        :rtype: SfoParameters
 
         :Example:
 
@@ -205,7 +308,11 @@ class SfoFile(object):
             :meth:`.set_parameter`,
             :meth:`.remove_parameter`
         """
-        return self._parameters._make(x.value for x in self._parameters)
+        params = self._parameters
+        if params._loader is None:
+            return params._make(x.value for x in params)
+        # Only decode the values which are used
+        return SfoParameters.lazy(params._fields, lambda name: params._get(name).value)
 
     def get_parameter(self, name: str) -> SfoParameter:
         r"""
@@ -259,9 +366,9 @@ class SfoFile(object):
             raise SfoDuplicateParameterError('Unable to add a SFO parameter with a duplicate name')
 
         p = SfoParameter.new(name, value)
-        names = (*self._parameters._fields, name)
-        values = (*self._parameters, p)
-        self._parameters = namedtuple('SfoParameters', names)(*values)
+        # Parameters are kept sorted by name, as they are when parsed
+        self._parameters = SfoParameters(sorted({**self._parameters._asdict(), name: p}.items()))
+        self._layout_changed()
         self._update_index()
 
     def set_parameter(self, name: str, value: str) -> None:
@@ -315,8 +422,8 @@ class SfoFile(object):
             :meth:`.add_parameter`,
             :meth:`.set_parameter`
         """
-        names, values = list(zip(*((k, v) for k, v in self._parameters._asdict().items() if k != name)))
-        self._parameters = namedtuple('SfoParameters', names)(*values)
+        self._parameters = SfoParameters((k, v) for k, v in self._parameters._asdict().items() if k != name)
+        self._layout_changed()
         self._update_index()
 
 
@@ -342,14 +449,33 @@ class SfoFile(object):
             :class:`.SfoCategory`
 
         """
-        # Find all required parameters (string compare is only to work around IPython autoreload)
-        all_params = VALID_SFO_PARAMETERS.values()
-        required_params = [v.name for v in all_params if str(category) in map(str, v.required)]
-        missing = set(required_params) - set(self._parameters._asdict())
+        fields = self._parameters._data
+        missing = {name for name in SFO_REQUIRED_PARAMETERS.get(category, ()) if name not in fields}
         if bool(missing):
             raise SfoMissingParameterError(
                 f'Not a valid SFO File for {category!r}. Missing Required parameters: {missing}')
 
+    def validate(self, category: Optional[SfoCategory] = None) -> List[str]:
+        """
+        Check the parameters of the file, returning a description of every problem found
+        instead of raising an exception for the first one
+
+        .. seealso:: :func:`.validate_parameters`
+
+        :param category: Category to check required parameters for, found from the ``CATEGORY`` parameter by default
+
+        :Example:
+
+        >>> sfo = SfoFile.parse_file('tests/data/PARAM.SFO')
+        >>> sfo.validate()
+        []
+        >>> sfo.remove_parameter('TITLE')
+        >>> sfo.validate()
+        ['Missing required parameters for SfoCategory.PS3: TITLE']
+
+        """
+        return validate_parameters(self.parameters._asdict(), category)
+
 
     def format(self, fmt: str) -> str:
         """
@@ -372,6 +498,8 @@ class SfoFile(object):
         %v        PS3_SYSTEM_VER
         ========  =========
 
+        .. seealso:: :class:`.FormatTemplate`
+
         :param fmt: Formatting string
         :rtype: str
 
@@ -382,24 +510,22 @@ class SfoFile(object):
         '[BLES00000]_(Example PS3ISO Game Title).iso'
 
         """
-        def param(name):
-            if not hasattr(self._parameters, name):
-                return ''
-            return str(getattr(self._parameters, name).value).strip()
-
-        return (fmt
-                .replace('%A', param('APP_VER'))
-                .replace('%a', param('ATTRIBUTE'))
-                .replace('%C', param('CATEGORY'))
-                .replace('%L', param('LICENSE'))
-                .replace('%P', param('PARENTAL_LEVEL'))
-                .replace('%R', param('RESOLUTION'))
-                .replace('%S', param('SOUND_FORMAT'))
-                .replace('%T', param('TITLE'))
-                .replace('%I', param('TITLE_ID'))
-                .replace('%V', param('VERSION'))
-                .replace('%v', param('PS3_SYSTEM_VER'))
-                )
+        return FormatTemplate.compile(fmt).render(self)
+
+    @staticmethod
+    def format_keys(fmt: str) -> Set[str]:
+        """
+        Return the names of the parameters used by a formatting string, for use with ``parse(keys=...)``
+
+        :param fmt: Formatting string, as accepted by :meth:`.format`
+
+        :Example:
+
+        >>> sorted(SfoFile.format_keys('[%I]_(%T).iso'))
+        ['TITLE', 'TITLE_ID']
+
+        """
+        return set(FormatTemplate.compile(fmt).keys)
 
     def write(self, dst: BinaryIO) -> int:
         r"""
@@ -431,9 +557,10 @@ class SfoFile(object):
 
         :Example:
 
+        >>> import os, tempfile
         >>> sfo = SfoFile.parse_file('tests/data/PARAM.SFO')
         >>> sfo.set_parameter('TITLE', 'NewTitle')
-        >>> sfo.write_file('NewTitle.SFO')
+        >>> sfo.write_file(os.path.join(tempfile.mkdtemp(), 'NewTitle.SFO'))
         1041
 
         """
@@ -441,16 +568,95 @@ class SfoFile(object):
             return self.write(f)
 
 
+    @classmethod
+    def patch_file(cls, path: Union[str, Path], **changes) -> bool:
+        """
+        Change parameter values in an existing SFO file.
+
+        When every new value fits in the space already allocated to its parameter, only the changed values
+        and their lengths in the index table are overwritten, leaving the rest of the file untouched.
+        Otherwise the file is parsed, changed and rewritten in full.
+        A :class:`ValueError` is raised, and the file is left unchanged,
+        if a new value is longer than the maximum length of its parameter when encoded.
+
+        :param path: Path to the SFO file
+        :param changes: New parameter values by name
+        :return: True if the file was patched in place, False if it was rewritten
+        :rtype: bool
+
+        :Example:
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'PARAM.SFO')
+        >>> SfoFile.parse_file('tests/data/PARAM.SFO').write_file(path)
+        1041
+        >>> SfoFile.patch_file(path, TITLE='NewTitle', APP_VER='01.01')
+        True
+        >>> SfoFile.parse_file(path).format('%T %A')
+        'NewTitle 01.01'
+
+        """
+        with open(path, 'r+b') as f:
+            data = f.read()
+            writes = cls._plan_patch(data, changes)
+            if writes is None:
+                sfo = cls.parse(data)
+                for name, value in changes.items():
+                    sfo.set_parameter(name, value)
+                f.seek(0)
+                f.write(bytes(sfo))
+                f.truncate()
+                return False
+            for offset, b in writes:
+                if hasattr(os, 'pwrite'):
+                    os.pwrite(f.fileno(), b, offset)
+                else:
+                    f.seek(offset)
+                    f.write(b)
+        return True
+
+    @classmethod
+    def _plan_patch(cls, data, changes: dict) -> Optional[List[Tuple[int, bytes]]]:
+        # Return the (offset, bytes) writes needed to apply the changes to serialized SFO data in place,
+        # or None if any parameter is missing, or a new value does not fit in its slot
+        if not changes:
+            return []
+        try:
+            sfo = cls.parse(data, lazy=True)
+        except SfoParseError:
+            return None
+        writes = []
+        found = set()
+        key_table = bytes(data[sfo.header.key_table_start:sfo.header.data_table_start])
+        records = sfo.index_table.records()
+        for n, (key_offset, data_fmt, data_len, data_max_len, data_offset) in enumerate(records):
+            key = key_table[key_offset:key_table.index(b'\0', key_offset)].decode('utf8')
+            if key not in changes:
+                continue
+            param = SfoParameter.new(key)
+            param.value = changes[key]
+            if param.fmt == SfoParameterFormat.int32:
+                value = struct.pack("<I", param.value)
+            else:
+                # Multibyte characters can make the encoded value longer than its length in characters
+                value = param.value.encode('utf8')
+                if param.fmt == SfoParameterFormat.utf8:
+                    value += b'\0'
+            value_start = sfo.header.data_table_start + data_offset
+            if (int.from_bytes(bytes(param.fmt), 'little') != data_fmt or len(value) > data_max_len
+                    or value_start + data_max_len > len(data)):
+                return None
+            entry_offset = SfoHeader.size + n * SfoIndexTableEntry.size
+            writes.append((value_start, value.ljust(data_max_len, b'\0')))
+            writes.append((entry_offset + 4, struct.pack("<I", len(value))))
+            found.add(key)
+        if found != changes.keys():
+            return None
+        return writes
+
     def __bytes__(self):
-        params = self._parameters._asdict()
-        data_table = b''.join((bytes(params[x]) for x in sorted(params.keys())))
-        # Concat header
-        b = bytes(self.header) + bytes(self.index_table) + self._key_table()
-        # key_table padding
-        b += self._padding()
-        # Add data table and LF
-        b += data_table + bytes([0x0a])
-        return b
+        return b''.join((bytes(self.header), bytes(self.index_table), self._key_table(), self._padding(),
+                         self._data_table()))
 
 
     def __iter__(self):
@@ -459,5 +665,6 @@ class SfoFile(object):
 
 
     def __repr__(self):
+        size = self.header.size + self.index_table.size + len(self._key_table()) + len(self._padding())
         return '<%s parameters=%d size=%d>' % (
-            type(self).__name__, len(self.parameters), len(bytes(self)))
+            type(self).__name__, len(self._parameters), size + len(self._data_table()))
@@ -0,0 +1,145 @@
+from __future__ import annotations
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, FrozenSet, List, Optional, Union
+
+
+SFO_FORMAT_VARIABLES = {
+    '%A': 'APP_VER',
+    '%a': 'ATTRIBUTE',
+    '%C': 'CATEGORY',
+    '%L': 'LICENSE',
+    '%P': 'PARENTAL_LEVEL',
+    '%R': 'RESOLUTION',
+    '%S': 'SOUND_FORMAT',
+    '%T': 'TITLE',
+    '%I': 'TITLE_ID',
+    '%V': 'VERSION',
+    '%v': 'PS3_SYSTEM_VER',
+}
+"""Formatting variables accepted by :meth:`.SfoFile.format`, and the parameter each is replaced with"""
+
+_ESCAPES = {
+    '\\n': '\n',
+    '\\t': '\t',
+}
+
+_Getter = Callable[[Any, Optional[Path]], str]
+
+
+def _parameter_getter(name: str) -> _Getter:
+    def get(sfo, path):
+        param = getattr(sfo._parameters, name, None)
+        return '' if param is None else str(param.value).strip()
+    return get
+
+
+def _name_getter(sfo, path: Path) -> str:
+    return path.name
+
+
+def _path_getter(sfo, path: Path) -> str:
+    return str(path)
+
+
+_FILE_GETTERS = {
+    '%f': _name_getter,
+    '%p': _path_getter,
+}
+
+
+class FormatTemplate(object):
+    """
+    A formatting string compiled once into literal text and variable lookups,
+    so it can be rendered for many files without searching the string again.
+
+    Each ``%`` variable of :data:`.SFO_FORMAT_VARIABLES` is replaced with the corresponding SFO parameter,
+    or an empty string if the parameter is missing.
+    With ``file_variables``, the variables of :meth:`.Game.print_info` are also expanded:
+    ``%f`` and ``%p`` with the name and full path of a file, and ``\\n`` and ``\\t`` with a newline and tab.
+
+    :param fmt: Formatting string
+    :param file_variables: Also expand the file name, path and escape variables
+
+    :Example:
+
+    >>> from ps3iso.sfo import SfoFile
+    >>> template = FormatTemplate('%I: %T (%f)', file_variables=True)
+    >>> sorted(template.keys)
+    ['TITLE', 'TITLE_ID']
+    >>> template.render(SfoFile.parse_file('tests/data/PARAM.SFO'), Path('Game.iso'))
+    'BLES00000: Example PS3ISO Game Title (Game.iso)'
+
+    """
+
+    def __init__(self, fmt: str, file_variables=False):
+        self.fmt = fmt
+        self.file_variables = file_variables
+        self._parts: List[Union[str, _Getter]] = []
+        keys = set()
+        literal = []
+        pos = 0
+        while pos < len(fmt):
+            token = fmt[pos:pos + 2]
+            if token in SFO_FORMAT_VARIABLES:
+                keys.add(SFO_FORMAT_VARIABLES[token])
+                getter = _parameter_getter(SFO_FORMAT_VARIABLES[token])
+            elif file_variables and token in _FILE_GETTERS:
+                getter = _FILE_GETTERS[token]
+            elif file_variables and token in _ESCAPES:
+                literal.append(_ESCAPES[token])
+                pos += 2
+                continue
+            else:
+                literal.append(fmt[pos])
+                pos += 1
+                continue
+            if literal:
+                self._parts.append(''.join(literal))
+                literal = []
+            self._parts.append(getter)
+            pos += 2
+        if literal:
+            self._parts.append(''.join(literal))
+        self._keys = frozenset(keys)
+
+    @classmethod
+    def compile(cls, fmt: str, file_variables=False) -> FormatTemplate:
+        """
+        Return the template for a formatting string, reusing one compiled by an earlier call
+
+        :param fmt: Formatting string
+        :param file_variables: Also expand the file name, path and escape variables
+        """
+        return _compile(cls, fmt, file_variables)
+
+    @property
+    def keys(self) -> FrozenSet[str]:
+        """
+        Names of the SFO parameters used by the template, for use with ``SfoFile.parse(keys=...)``
+        """
+        return self._keys
+
+    @property
+    def uses_path(self) -> bool:
+        """
+        True if the template contains the ``%f`` or ``%p`` variables
+        """
+        return any(part in (_name_getter, _path_getter) for part in self._parts)
+
+    def render(self, sfo, path: Optional[Path] = None) -> str:
+        """
+        Return the formatted string for an SFO file
+
+        :param SfoFile sfo: SFO data to take parameters from
+        :param path: File to use for the ``%f`` and ``%p`` variables, required if the template uses them
+        """
+        return ''.join([part if part.__class__ is str else part(sfo, path) for part in self._parts])
+
+    def __repr__(self):
+        return '%s(%r, file_variables=%r)' % (type(self).__name__, self.fmt, self.file_variables)
+
+
+@lru_cache(maxsize=64)
+def _compile(cls, fmt: str, file_variables: bool) -> FormatTemplate:
+    return cls(fmt, file_variables)
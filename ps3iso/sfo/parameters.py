@@ -2,6 +2,8 @@ from __future__ import annotations
 import struct
 import enum
 import re
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, Mapping, Tuple
 
 from .errors import SfoUnknownParameterError
 
@@ -16,12 +18,13 @@ class _SfoParameterFormatMeta(type):
         }
         for name in cls._map:
             setattr(cls, name, cls(name))
+        cls._by_bytes = {v: getattr(cls, k) for k, v in cls._map.items()}
 
     def _from_bytes(cls, b: bytes) -> SfoParameterFormat:
-        for k, v in cls._map.items():
-            if b == v:
-                return getattr(cls, k)
-        raise ValueError(f'Unknown parameter format bytes: ' + str(b))
+        try:
+            return cls._by_bytes[bytes(b)]
+        except KeyError:
+            raise ValueError(f'Unknown parameter format bytes: ' + str(b)) from None
 
     def _to_bytes(cls, name: str) -> bytes:
         try:
@@ -109,10 +112,42 @@ class SfoCategory(enum.IntFlag):
     PS2Data = 0x40
     PS3Data = 0x80
 
+    @classmethod
+    def from_code(cls, code: str) -> SfoCategory:
+        """
+        Return the category of a ``CATEGORY`` parameter value.
+        Raises ValueError if the code is not recognised
+
+        :param code: Value of the ``CATEGORY`` parameter, e.g. ``DG`` for a PS3 disc game
+
+        :Example:
+
+        >>> SfoCategory.from_code('DG')
+        SfoCategory.PS3
+
+        """
+        try:
+            return _CATEGORY_CODES[code]
+        except KeyError:
+            raise ValueError('Unknown SFO category code: %r' % code) from None
+
     def __repr__(self):
         return '%s.%s' % (self.__class__.__name__, self.name)
 
 
+_CATEGORY_CODES = {
+    'DG': SfoCategory.PS3,
+    'HG': SfoCategory.PS3,
+    'GD': SfoCategory.PS3Data,
+    'SD': SfoCategory.PS3Data,
+    '1P': SfoCategory.PS1,
+    '2P': SfoCategory.PS2,
+    'UG': SfoCategory.PSP,
+    'MG': SfoCategory.PSP,
+    'MS': SfoCategory.PSPData,
+}
+
+
 class SfoParameter(object):
     """
     Class representing an SFO parameter.
@@ -129,6 +164,8 @@ class SfoParameter(object):
 
     """
 
+    __slots__ = ('_name', '_value', 'fmt', 'length', 'maxlength', 'required', 'optional', 'variable_key_range')
+
     def __init__(self, name,
                  fmt=SfoParameterFormat.int32,
                  length=None,
@@ -154,23 +191,21 @@ class SfoParameter(object):
         self.fmt = fmt
         self.length = length
         self.maxlength = maxlength
-        self.required = required or []
-        self.optional = optional or []
+        # Category tuples are immutable, so copies of a parameter can share them
+        self.required = tuple(required or ())
+        self.optional = tuple(optional or ())
         self.variable_key_range = variable_key_range
 
     def __repr__(self):
         classname = self.__class__.__name__
         return '%s(%r, fmt=%s, length=%r, maxlength=%r, required=%r, optional=%r, value=%r)' % (
-            classname, self.name, self.fmt, self.length, self.maxlength, self.required, self.optional, self.value)
+            classname, self.name, self.fmt, self.length, self.maxlength,
+            list(self.required), list(self.optional), self.value)
 
     def __eq__(self, other):
         if not isinstance(other, SfoParameter):
             return False
-        for key in self.__dict__:
-            if key != 'methods':
-                if self.__dict__[key] != other.__dict__[key]:
-                    return False
-        return True
+        return all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
 
     def __bytes__(self):
         if self.fmt == SfoParameterFormat.int32:
@@ -179,6 +214,8 @@ class SfoParameter(object):
             b = bytes(self.value, 'utf8') + b'\0'
         else:
             b = bytes(self.value, 'utf8')
+        if len(b) > self.maxlength:
+            raise ValueError('%s is %d bytes long, the maximum is %d' % (self.name, len(b), self.maxlength))
         return b + bytes(self.maxlength - len(b))
 
     @property
@@ -236,8 +273,8 @@ class SfoParameter(object):
                            fmt=self.fmt,
                            length=self.length,
                            maxlength=self.maxlength,
-                           required=self.required.copy(),
-                           optional=self.optional.copy(),
+                           required=self.required,
+                           optional=self.optional,
                            value=value)
         return obj
 
@@ -252,17 +289,165 @@ class SfoParameter(object):
 
         """
         try:
-            return VALID_SFO_PARAMETERS[name].copy(value)
+            return SFO_PARAMETER_REGISTRY[name].copy(value)
         except KeyError:
-            key_regex = re.compile('xx?')
-            for pname, param in VALID_SFO_PARAMETERS.items():
-                if param.variable_key_range is not None:
-                    for x in param.variable_key_range:
-                        key = key_regex.sub(x, pname)
-                        if key == name:
-                            param._name = key
-                            return param.copy(value)
-            raise SfoUnknownParameterError(name)
+            raise SfoUnknownParameterError(name) from None
+
+    def expand(self) -> Iterator[SfoParameter]:
+        """
+        Yield a copy of the parameter for every concrete key it describes.
+        Parameters with a ``variable_key_range`` expand to one copy per value in the range,
+        other parameters yield a single copy of themselves.
+
+        >>> [p.name for p in VALID_SFO_PARAMETERS['PARENTAL_LEVEL_x'].expand()]
+        ['PARENTAL_LEVEL_A', 'PARENTAL_LEVEL_C', 'PARENTAL_LEVEL_E', 'PARENTAL_LEVEL_H', 'PARENTAL_LEVEL_J', 'PARENTAL_LEVEL_K']
+
+        """
+        if self.variable_key_range is None:
+            yield self.copy(self.value)
+            return
+        for x in self.variable_key_range:
+            param = self.copy(self.value)
+            param._name = _VARIABLE_KEY_REGEX.sub(x, self.name)
+            yield param
+
+
+_VARIABLE_KEY_REGEX = re.compile('xx?')
+
+
+_UNLOADED = object()
+
+
+class SfoParameters(object):
+    """
+    Immutable container of SFO parameters, accessed by attribute like a :func:`~collections.namedtuple`.
+
+    Unlike a named tuple, no new class is created for each set of parameter names.
+    Iterating yields the parameter values in order, and the ``_fields``, ``_asdict``,
+    ``_make`` and ``_replace`` methods behave like their named tuple equivalents.
+
+    Containers created with :meth:`.lazy` only load each value when it is first accessed.
+
+    :param args: Mapping or iterable of ``(name, value)`` pairs, as accepted by :class:`dict`
+    :param kwargs: Further parameters by name
+
+    :Example:
+
+    >>> params = SfoParameters(TITLE='Example', TITLE_ID='BLES00000')
+    >>> params.TITLE
+    'Example'
+    >>> params._fields
+    ('TITLE', 'TITLE_ID')
+    >>> params._replace(TITLE='Other')
+    SfoParameters(TITLE='Other', TITLE_ID='BLES00000')
+    >>> params.VERSION
+    Traceback (most recent call last):
+    AttributeError: 'SfoParameters' object has no attribute 'VERSION'
+
+    """
+
+    __slots__ = ('_data', '_loader')
+
+    def __init__(self, *args, **kwargs):
+        object.__setattr__(self, '_data', dict(*args, **kwargs))
+        object.__setattr__(self, '_loader', None)
+
+    @classmethod
+    def lazy(cls, names: Iterable[str], loader: Callable[[str], Any]) -> SfoParameters:
+        """
+        Create a container of the given parameter names, calling ``loader(name)`` to get each value on first access
+
+        :param names: Parameter names
+        :param loader: Function returning the value of a parameter
+
+        :Example:
+
+        >>> params = SfoParameters.lazy(['TITLE', 'TITLE_ID'], lambda name: print('loading', name) or name.lower())
+        >>> params.TITLE
+        loading TITLE
+        'title'
+        >>> params.TITLE
+        'title'
+
+        """
+        params = cls.__new__(cls)
+        object.__setattr__(params, '_data', dict.fromkeys(names, _UNLOADED))
+        object.__setattr__(params, '_loader', loader)
+        return params
+
+    def _get(self, name: str) -> Any:
+        value = self._data[name]
+        if value is _UNLOADED:
+            value = self._data[name] = self._loader(name)
+        return value
+
+    def _items(self) -> Dict[str, Any]:
+        # Load any remaining values, after which the loader is no longer needed
+        if self._loader is not None:
+            for name in self._data:
+                self._get(name)
+            object.__setattr__(self, '_loader', None)
+        return self._data
+
+    def __getattr__(self, name):
+        # Only called when normal attribute lookup fails, private names are never parameters
+        if not name.startswith('_'):
+            try:
+                return self._get(name)
+            except KeyError:
+                pass
+        raise AttributeError('%r object has no attribute %r' % (type(self).__name__, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set attribute")
+
+    def __dir__(self):
+        return [*super().__dir__(), *self._data]
+
+    @property
+    def _fields(self) -> Tuple[str, ...]:
+        return tuple(self._data)
+
+    def _asdict(self) -> Dict[str, Any]:
+        return dict(self._items())
+
+    def _make(self, iterable: Iterable) -> SfoParameters:
+        return type(self)(zip(self._data, iterable))
+
+    def _replace(self, **kwargs) -> SfoParameters:
+        unknown = kwargs.keys() - self._data.keys()
+        if unknown:
+            raise ValueError('Got unexpected field names: %r' % sorted(unknown))
+        return type(self)(self._items(), **kwargs)
+
+    def __iter__(self):
+        return iter(self._items().values())
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return self._get(item)
+        return tuple(self._items().values())[item]
+
+    def __eq__(self, other):
+        if isinstance(other, SfoParameters):
+            # Ordered like the named tuple it replaces, so equal containers always hash equally
+            return list(self._items().items()) == list(other._items().items())
+        if isinstance(other, tuple):
+            return tuple(self) == other
+        return NotImplemented
+
+    def __hash__(self):
+        # Hashed like the named tuple of the values, which compares equal to the container
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return type(self), (self._items(),)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join('%s=%r' % item for item in self._items().items()))
 
 
 # TODO: Only Bootable PS3 and PS1 SFOs have been added for now, but it should be easy to add others.
@@ -490,3 +675,56 @@ VALID_SFO_PARAMETERS = {p.name: p for p in ((
             tablefmt='rst'))
 
 """
+
+
+def _build_registry() -> Mapping[str, SfoParameter]:
+    registry = {}
+    for param in VALID_SFO_PARAMETERS.values():
+        if param.variable_key_range is not None:
+            registry.update((p.name, p) for p in param.expand())
+    # Names which are defined explicitly take precedence over expanded variable keys
+    registry.update(VALID_SFO_PARAMETERS)
+    return MappingProxyType(registry)
+
+
+SFO_PARAMETER_REGISTRY = _build_registry()
+"""
+    :type: Mapping[str, SfoParameter]
+
+    :annotation:
+
+    Read-only mapping of every concrete parameter name to its prototype, built once from :data:`.VALID_SFO_PARAMETERS`,
+    with variable keys such as ``TITLE_xx`` expanded to ``TITLE_00`` ... ``TITLE_29``.
+    Prototypes are only ever copied by :meth:`.SfoParameter.new`, never modified.
+
+"""
+
+
+def _build_category_sets(attribute: str) -> Mapping[SfoCategory, FrozenSet[str]]:
+    # Category members compare equal by value, so lookups also work after the module is reloaded
+    return MappingProxyType({
+        category: frozenset(name for name, param in SFO_PARAMETER_REGISTRY.items()
+                            if category in getattr(param, attribute))
+        for category in SfoCategory})
+
+
+SFO_REQUIRED_PARAMETERS = _build_category_sets('required')
+"""
+    :type: Mapping[SfoCategory, FrozenSet[str]]
+
+    :annotation:
+
+    Names of the parameters required by each :class:`.SfoCategory`, built once from :data:`.SFO_PARAMETER_REGISTRY`
+
+"""
+
+SFO_OPTIONAL_PARAMETERS = _build_category_sets('optional')
+"""
+    :type: Mapping[SfoCategory, FrozenSet[str]]
+
+    :annotation:
+
+    Names of the parameters which are optional for each :class:`.SfoCategory`,
+    with variable keys expanded as in :data:`.SFO_PARAMETER_REGISTRY`
+
+"""
@@ -0,0 +1,459 @@
+from __future__ import annotations
+import struct
+from array import array
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .parameters import SfoParameterFormat, SFO_PARAMETER_REGISTRY
+from .errors import SfoParseError
+from ._file import SfoHeader, SfoIndexTableEntry, _ENTRY_STRUCT
+from .file import _INT32_FORMAT
+
+
+_HEADER_STRUCT = struct.Struct("<5I")
+_FORMATS = frozenset(int.from_bytes(bytes(getattr(SfoParameterFormat, name)), 'little')
+                     for name in ('int32', 'utf8', 'utf8s'))
+
+_Record = Tuple[int, int, int, int]
+_MAX_KEY_LENGTH = max(map(len, SFO_PARAMETER_REGISTRY))
+
+if numpy is not None:
+    _HEADER_DTYPE = numpy.dtype([('magic', '<u4'), ('version', '<u4'), ('key_table_start', '<u4'),
+                                 ('data_table_start', '<u4'), ('table_entries', '<u4')])
+    _ENTRY_DTYPE = numpy.dtype([('key_offset', '<u2'), ('data_fmt', '<u2'), ('data_len', '<u4'),
+                                ('data_max_len', '<u4'), ('data_offset', '<u4')])
+
+
+def _read_records(data: bytes) -> List[_Record]:
+    # Return the (key_start, data_fmt, value_start, value_end) of every index entry, checking the same
+    # constraints as SfoFile.parse. Keys and values are decoded by SfoTable._decode
+    if len(data) < SfoHeader.size:
+        raise SfoParseError('An invalid SFO header was encountered')
+    magic, _, key_table_start, data_table_start, table_entries = _HEADER_STRUCT.unpack_from(data)
+    if magic != SfoHeader.SFO_HEADER_MAGIC:
+        raise SfoParseError(f'Magic bytes ({hex(SfoHeader.SFO_HEADER_MAGIC)}) not found')
+    index_end = SfoHeader.size + SfoIndexTableEntry.size * table_entries
+    if index_end > len(data):
+        raise SfoParseError('An invalid SFO index table was encountered')
+    entries = list(_ENTRY_STRUCT.iter_unpack(data[SfoHeader.size:index_end]))
+    if any(data_fmt not in _FORMATS for _, data_fmt, _, _, _ in entries):
+        raise SfoParseError('An invalid SFO index table was encountered')
+    return [(key_table_start + key_offset, data_fmt, data_table_start + data_offset,
+             data_table_start + data_offset + data_len)
+            for key_offset, data_fmt, data_len, _, data_offset in entries]
+
+
+class _Batch(object):
+    # Index entries of a batch of SFO files, decoded with NumPy. Each array holds one element per entry,
+    # for the entries of every file whose header and index table are valid
+
+    def __init__(self, datas: List[bytes]):
+        lengths = numpy.fromiter(map(len, datas), dtype=numpy.uint64, count=len(datas))
+        headers = numpy.frombuffer(b''.join(data[:SfoHeader.size].ljust(SfoHeader.size, b'\0') for data in datas),
+                                   dtype=_HEADER_DTYPE)
+        short = lengths < SfoHeader.size
+        bad_magic = ~short & (headers['magic'] != SfoHeader.SFO_HEADER_MAGIC)
+        table_entries = headers['table_entries'].astype(numpy.uint64)
+        bad_index = ~short & ~bad_magic & (SfoHeader.size + SfoIndexTableEntry.size * table_entries > lengths)
+        counts = numpy.where(short | bad_magic | bad_index, 0, table_entries).astype(numpy.int64)
+
+        entries = numpy.frombuffer(
+            b''.join(data[SfoHeader.size:SfoHeader.size + SfoIndexTableEntry.size * count]
+                     for data, count in zip(datas, counts.tolist())),
+            dtype=_ENTRY_DTYPE)
+        owner = numpy.repeat(numpy.arange(len(datas)), counts)
+        bad_index |= numpy.bincount(owner[~numpy.isin(entries['data_fmt'], list(_FORMATS))],
+                                    minlength=len(datas)) > 0
+
+        #: The error of each file with an invalid header or index table, otherwise None
+        self.errors: List[Optional[SfoParseError]] = [None] * len(datas)
+        for n in numpy.flatnonzero(short).tolist():
+            self.errors[n] = SfoParseError('An invalid SFO header was encountered')
+        for n in numpy.flatnonzero(bad_magic).tolist():
+            self.errors[n] = SfoParseError(f'Magic bytes ({hex(SfoHeader.SFO_HEADER_MAGIC)}) not found')
+        for n in numpy.flatnonzero(bad_index).tolist():
+            self.errors[n] = SfoParseError('An invalid SFO index table was encountered')
+        valid = ~bad_index[owner]
+        entries, owner = entries[valid], owner[valid]
+
+        self.owner = owner
+        self.is_int = entries['data_fmt'] == _INT32_FORMAT
+        self.value_starts = headers['data_table_start'].astype(numpy.uint64)[owner] + entries['data_offset']
+        self.value_ends = self.value_starts + entries['data_len']
+        self.file_lengths = lengths[owner]
+        self.data = b''.join(datas)
+        self.bases = (numpy.cumsum(lengths) - lengths)[owner]
+        data = numpy.frombuffer(self.data, dtype=numpy.uint8)
+        ends = self.bases + self.file_lengths
+
+        # Gather the bytes of every key which could be a known parameter, and decode each distinct key once.
+        # Bytes past the end of a file are replaced with 0xff, so only keys terminated inside the file are found
+        width = _MAX_KEY_LENGTH + 1
+        key_starts = numpy.minimum(self.bases + headers['key_table_start'].astype(numpy.uint64)[owner] +
+                                   entries['key_offset'], len(data))
+        padded = numpy.concatenate((data, numpy.full(width, 0xff, dtype=numpy.uint8)))
+        windows = numpy.lib.stride_tricks.sliding_window_view(padded, width)
+        key_bytes = windows[key_starts]
+        key_bytes[numpy.arange(width) >= (ends - numpy.minimum(key_starts, ends))[:, None].astype(numpy.int64)] = 0xff
+        terminated = (key_bytes == 0).any(axis=1)
+        # Clear everything after the first null, so each row holds exactly one key
+        key_bytes *= numpy.cumprod(key_bytes != 0, axis=1, dtype=numpy.uint8)
+        distinct, inverse = numpy.unique(key_bytes.view('S%d' % (_MAX_KEY_LENGTH + 1)).ravel(), return_inverse=True)
+        #: Distinct key names, None for those which are not valid UTF-8
+        self.names: List[Optional[str]] = []
+        for name in distinct.tolist():
+            try:
+                self.names.append(name.decode('utf8'))
+            except UnicodeDecodeError:
+                self.names.append(None)
+        #: Position of the key of each entry in names, -1 where it was not found
+        self.key_ids = numpy.where(terminated, inverse.ravel(), -1)
+
+        # Gather the four bytes of every int32 value inside its file
+        self.int_ok = self.is_int & (self.value_starts + 4 <= self.file_lengths)
+        self.int_values = windows[numpy.where(self.int_ok, self.bases + self.value_starts, 0), :4].copy().view('<u4')
+        self.int_values = self.int_values.ravel().astype(numpy.uint32)
+
+
+class SfoTable(object):
+    """
+    Columnar table of the parameters of many SFO files, for analysis across a whole library.
+
+    Each parameter is held in a single column with one entry per file, along with a presence mask
+    (a :class:`bytearray` of ``1`` and ``0``) recording which files contain it.
+    Integer parameters are packed in an ``array('I')``, holding ``0`` where the parameter is missing,
+    and string parameters are held in a list, holding ``None`` where the parameter is missing.
+
+    .. seealso:: :meth:`.from_buffers`
+
+    :param keys: Only store these parameters, ignoring any others (including unknown ones)
+
+    :Example:
+
+    >>> from pathlib import Path
+    >>> data = Path('tests/data/PARAM.SFO').read_bytes()
+    >>> table = SfoTable.from_buffers([data, data], keys={'TITLE_ID', 'PARENTAL_LEVEL'})
+    >>> len(table)
+    2
+    >>> table.column('PARENTAL_LEVEL')
+    array('I', [5, 5])
+    >>> table.duplicates('TITLE_ID')
+    {'BLES00000': [0, 1]}
+
+    """
+
+    def __init__(self, keys: Optional[Iterable[str]] = None):
+        self._keys = None if keys is None else frozenset(keys)
+        self._rows = 0
+        self._columns: Dict[str, Union[array, List[Optional[str]]]] = {}
+        self._masks: Dict[str, bytearray] = {}
+        self.errors: List[Tuple[int, SfoParseError]] = []
+
+    @classmethod
+    def from_buffers(cls, buffers: Iterable[Any], keys: Optional[Iterable[str]] = None,
+                     errors='raise', batch_size=4096, use_numpy: Optional[bool] = None) -> SfoTable:
+        """
+        Parse many SFO files into a new table
+
+        When NumPy is installed, the headers, index tables, keys and integer values of each batch of files
+        are decoded and validated together, and integer columns are filled directly from the decoded arrays.
+        Only string values, and files with invalid entries, are decoded one at a time.
+        The results are the same with or without NumPy.
+
+        Parameters are checked more strictly than by :meth:`.SfoFile.parse`:
+        a file is invalid if the format of a value does not match the type of its parameter.
+
+        :param buffers: Raw SFO data, e.g. :class:`bytes` or :class:`memoryview` objects
+        :param keys: Only store these parameters
+        :param errors: ``'raise'`` to raise an :class:`.SfoParseError` for the first invalid file,
+                       or ``'skip'`` to leave invalid files out of the table and record them in :attr:`.errors`
+        :param batch_size: Number of files to decode at once
+        :param use_numpy: Use NumPy to decode each batch, defaults to ``True`` if it is installed
+        """
+        if errors not in ('raise', 'skip'):
+            raise ValueError('errors must be "raise" or "skip"')
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError('NumPy is not installed')
+        table = cls(keys)
+        batch: List[bytes] = []
+        for buf in buffers:
+            batch.append(buf if isinstance(buf, bytes) else bytes(buf))
+            if len(batch) >= batch_size:
+                table._append_batch(batch, errors, use_numpy)
+                batch = []
+        if batch:
+            table._append_batch(batch, errors, use_numpy)
+        return table
+
+    def _append_batch(self, datas: List[bytes], errors: str, use_numpy: bool) -> None:
+        if use_numpy:
+            return self._append_numpy_batch(datas, errors)
+        first = self._rows + len(self.errors)
+        for n, data in enumerate(datas):
+            try:
+                values = self._decode(data, _read_records(data))
+            except SfoParseError as ex:
+                if errors == 'raise':
+                    raise
+                self.errors.append((first + n, ex))
+            else:
+                self._append_values(values)
+
+    def _append_numpy_batch(self, datas: List[bytes], errors: str) -> None:
+        first = self._rows + len(self.errors)
+        batch = _Batch(datas)
+        failures = batch.errors
+
+        # Look up each distinct key once. The last element describes entries whose key was not found
+        wanted = [name is not None and (self._keys is None or name in self._keys) for name in batch.names]
+        prototypes = [SFO_PARAMETER_REGISTRY.get(name) if want else None for name, want in zip(batch.names, wanted)]
+        decoded = numpy.array([name is not None for name in batch.names] + [False], dtype=bool)
+        wanted = numpy.array(wanted + [False], dtype=bool)
+        known = numpy.array([p is not None for p in prototypes] + [False], dtype=bool)
+        int_keys = numpy.array([p is not None and p.fmt == SfoParameterFormat.int32 for p in prototypes] + [False],
+                               dtype=bool)
+
+        # Entries of stored parameters which are valid as they stand. Files with any other entry, such as
+        # an unknown key or a value past the end of the data, or with a repeated key, are decoded by _decode
+        # to report the same error in the same order
+        ids = batch.key_ids
+        stored = wanted[ids]
+        valid = decoded[ids] & (~stored | (known[ids] & (batch.is_int == int_keys[ids]) &
+                                           (batch.value_ends <= batch.file_lengths) & (~batch.is_int | batch.int_ok)))
+        fallback = numpy.bincount(batch.owner[~valid], minlength=len(datas)) > 0
+        pairs = batch.owner[stored] * (len(batch.names) + 1) + ids[stored]
+        unique, repeats = numpy.unique(pairs, return_counts=True)
+        fallback[unique[repeats > 1] // (len(batch.names) + 1)] = True
+        stored &= ~fallback[batch.owner]
+
+        # String values are decoded a column at a time, and an invalid one leaves its file out of the table
+        view = memoryview(batch.data)
+        starts = batch.bases + batch.value_starts
+        ends = batch.bases + batch.value_ends
+        selected = stored & ~batch.is_int
+        strings: Dict[str, Tuple[Any, List[Optional[str]]]] = {}
+        invalid: Dict[int, Tuple[int, str, UnicodeDecodeError]] = {}
+        for key_id in numpy.unique(ids[selected]).tolist():
+            name = batch.names[key_id]
+            entries = numpy.flatnonzero(selected & (ids == key_id))
+            bounds = list(zip(starts[entries].tolist(), ends[entries].tolist()))
+            try:
+                values = [str(view[start:end], 'utf8').rstrip('\x00') for start, end in bounds]
+            except UnicodeDecodeError:
+                values = []
+                for entry, (start, end) in zip(entries.tolist(), bounds):
+                    try:
+                        values.append(str(view[start:end], 'utf8').rstrip('\x00'))
+                    except UnicodeDecodeError as ex:
+                        values.append(None)
+                        # Report the first invalid value of each file
+                        n = int(batch.owner[entry])
+                        if n not in invalid or invalid[n][0] > entry:
+                            invalid[n] = (entry, name, ex)
+            strings[name] = (entries, values)
+        for n, (_, name, ex) in invalid.items():
+            failures[n] = SfoParseError('An invalid value was encountered for %s' % name)
+            failures[n].__cause__ = ex
+
+        fallback_values: Dict[int, Dict[str, Any]] = {}
+        for n in numpy.flatnonzero(fallback).tolist():
+            if failures[n] is None:
+                try:
+                    fallback_values[n] = self._decode(datas[n], _read_records(datas[n]))
+                except SfoParseError as ex:
+                    failures[n] = ex
+        for n, ex in enumerate(failures):
+            if ex is not None:
+                if errors == 'raise':
+                    raise ex
+                self.errors.append((first + n, ex))
+
+        # Row of each file in the batch, -1 for files left out
+        included = numpy.array([ex is None for ex in failures], dtype=bool)
+        rows = numpy.cumsum(included) - 1
+        count = int(included.sum()) if len(datas) else 0
+        columns: Dict[str, Any] = {}
+        masks: Dict[str, Any] = {}
+
+        # Integer columns are assembled directly from the gathered values
+        selected = stored & batch.is_int & included[batch.owner]
+        for key_id in numpy.unique(ids[selected]).tolist():
+            entry = selected & (ids == key_id)
+            name = batch.names[key_id]
+            columns[name] = numpy.zeros(count, dtype=numpy.uint32)
+            masks[name] = numpy.zeros(count, dtype=numpy.uint8)
+            columns[name][rows[batch.owner[entry]]] = batch.int_values[entry]
+            masks[name][rows[batch.owner[entry]]] = 1
+        for name, (entries, values) in strings.items():
+            keep = included[batch.owner[entries]]
+            column = numpy.full(count, None, dtype=object)
+            masks[name] = numpy.zeros(count, dtype=numpy.uint8)
+            column[rows[batch.owner[entries[keep]]]] = numpy.array(values, dtype=object)[keep]
+            masks[name][rows[batch.owner[entries[keep]]]] = 1
+            columns[name] = column.tolist()
+        for n, values in fallback_values.items():
+            for name, value in values.items():
+                if name not in columns:
+                    columns[name] = numpy.zeros(count, dtype=numpy.uint32) if self._is_int(name) else [None] * count
+                    masks[name] = numpy.zeros(count, dtype=numpy.uint8)
+                columns[name][rows[n]] = value
+                masks[name][rows[n]] = 1
+        self._extend(count, columns, masks)
+
+    def _extend(self, count: int, columns: Dict[str, Any], masks: Dict[str, Any]) -> None:
+        # Add count rows at once, from NumPy arrays of integer values, lists of string values and NumPy masks
+        for key in columns.keys() - self._columns.keys():
+            if self._is_int(key):
+                self._columns[key] = array('I', bytes(4 * self._rows))
+            else:
+                self._columns[key] = [None] * self._rows
+            self._masks[key] = bytearray(self._rows)
+        for key, column in self._columns.items():
+            values = columns.get(key)
+            if values is None:
+                column.extend(array('I', bytes(4 * count)) if isinstance(column, array) else [None] * count)
+                self._masks[key].extend(bytes(count))
+            else:
+                column.frombytes(values.tobytes()) if isinstance(column, array) else column.extend(values)
+                self._masks[key].extend(masks[key].tobytes())
+        self._rows += count
+
+    def _decode(self, data: bytes, records: List[_Record]) -> Dict[str, Any]:
+        view = memoryview(data)
+        values = {}
+        for key_start, data_fmt, value_start, value_end in records:
+            key_end = data.find(b'\0', key_start)
+            if key_end == -1:
+                raise SfoParseError('Unterminated key at offset %d' % key_start)
+            try:
+                key = str(view[key_start:key_end], 'utf8')
+            except UnicodeDecodeError as ex:
+                raise SfoParseError('An invalid key was encountered at offset %d' % key_start) from ex
+            if self._keys is not None and key not in self._keys:
+                continue
+            prototype = SFO_PARAMETER_REGISTRY.get(key)
+            if prototype is None:
+                raise SfoParseError('An invalid parameter was encountered (%s)' % key)
+            if (data_fmt == _INT32_FORMAT) != (prototype.fmt == SfoParameterFormat.int32):
+                raise SfoParseError('Unexpected value format for %s' % key)
+            if value_end > len(view):
+                raise SfoParseError('Value of %s extends past the end of the data' % key)
+            if data_fmt == _INT32_FORMAT:
+                if value_start + 4 > len(view):
+                    raise SfoParseError('Value of %s extends past the end of the data' % key)
+                values[prototype.name] = struct.unpack_from("<I", view, value_start)[0]
+            else:
+                try:
+                    values[prototype.name] = str(view[value_start:value_end], 'utf8').rstrip('\x00')
+                except UnicodeDecodeError as ex:
+                    raise SfoParseError('An invalid value was encountered for %s' % key) from ex
+        return values
+
+    def append(self, buf) -> None:
+        """
+        Parse an SFO file and add it to the end of the table.
+        An :class:`.SfoParseError` is raised if it is invalid, leaving the table unchanged.
+
+        :param buf: Raw SFO data
+        """
+        data = buf if isinstance(buf, bytes) else bytes(buf)
+        self._append_values(self._decode(data, _read_records(data)))
+
+    def _append_values(self, values: Dict[str, Any]) -> None:
+        for key in values.keys() - self._columns.keys():
+            if SFO_PARAMETER_REGISTRY[key].fmt == SfoParameterFormat.int32:
+                self._columns[key] = array('I', bytes(4 * self._rows))
+            else:
+                self._columns[key] = [None] * self._rows
+            self._masks[key] = bytearray(self._rows)
+        for key, column in self._columns.items():
+            value = values.get(key)
+            if value is None:
+                column.append(0 if isinstance(column, array) else None)
+                self._masks[key].append(0)
+            else:
+                column.append(value)
+                self._masks[key].append(1)
+        self._rows += 1
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def keys(self) -> List[str]:
+        """
+        Sorted list of the parameters found in any file
+        """
+        return sorted(self._columns)
+
+    def column(self, key: str) -> Union[array, List[Optional[str]]]:
+        """
+        Return the column of values of a parameter, with one entry per file
+
+        :param key: Parameter name
+        """
+        try:
+            return self._columns[key]
+        except KeyError:
+            return array('I', bytes(4 * self._rows)) if self._is_int(key) else [None] * self._rows
+
+    def mask(self, key: str) -> bytearray:
+        """
+        Return the presence mask of a parameter, holding ``1`` for each file which contains it
+
+        :param key: Parameter name
+        """
+        return self._masks.get(key, bytearray(self._rows))
+
+    @staticmethod
+    def _is_int(key: str) -> bool:
+        prototype = SFO_PARAMETER_REGISTRY.get(key)
+        return prototype is not None and prototype.fmt == SfoParameterFormat.int32
+
+    def values(self, key: str) -> Iterator[Any]:
+        """
+        Iterate over the values of a parameter in the files which contain it
+
+        :param key: Parameter name
+        """
+        return (value for value, present in zip(self.column(key), self.mask(key)) if present)
+
+    def value_counts(self, key: str) -> Counter:
+        """
+        Count the occurrences of each value of a parameter, e.g. for a region or firmware breakdown
+
+        :param key: Parameter name
+        """
+        return Counter(self.values(key))
+
+    def duplicates(self, key: str) -> Dict[Any, List[int]]:
+        """
+        Find the values of a parameter shared by more than one file
+
+        :param key: Parameter name
+        :return: Row numbers of the files sharing each duplicated value
+        """
+        rows = defaultdict(list)
+        for n, (value, present) in enumerate(zip(self.column(key), self.mask(key))):
+            if present:
+                rows[value].append(n)
+        return {value: found for value, found in rows.items() if len(found) > 1}
+
+    def row(self, n: int) -> Dict[str, Any]:
+        """
+        Return the parameters of a single file
+
+        :param n: Row number
+        """
+        n = range(self._rows)[n]
+        return {key: self._columns[key][n] for key in self.keys if self._masks[key][n]}
+
+    def __repr__(self):
+        return '<%s rows=%d keys=%d>' % (type(self).__name__, self._rows, len(self._columns))
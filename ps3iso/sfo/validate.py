@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import Any, List, Mapping, Optional
+
+from .parameters import SfoCategory, SfoParameterFormat, SFO_PARAMETER_REGISTRY, SFO_REQUIRED_PARAMETERS
+
+
+def validate_parameters(parameters: Mapping[str, Any], category: Optional[SfoCategory] = None) -> List[str]:
+    """
+    Check a set of SFO parameter values, returning a description of every problem found.
+    Nothing is raised, so all problems with a file can be reported at once.
+
+    The following are checked:
+
+    * Every parameter name is known, see :data:`.SFO_PARAMETER_REGISTRY`
+    * All parameters required by the category are present, see :data:`.SFO_REQUIRED_PARAMETERS`
+    * Every value has the type of its parameter, and fits within its ``maxlength``
+
+    :param parameters: Parameter values by name, e.g. ``sfo.parameters._asdict()``
+    :param category: Category to check required parameters for.
+                     By default it is found from the ``CATEGORY`` parameter with :meth:`.SfoCategory.from_code`
+    :return: Problems found, an empty list if the parameters are valid
+
+    :Example:
+
+    >>> validate_parameters({'CATEGORY': 'DG', 'TITLE': 'x' * 200, 'BOOTABLE': 1, 'LICENSE': '',
+    ...                      'PARENTAL_LEVEL': 1, 'PS3_SYSTEM_VER': '02.5200', 'RESOLUTION': 63,
+    ...                      'SOUND_FORMAT': 1, 'VERSION': '01.00'})
+    ['Missing required parameters for SfoCategory.PS3: TITLE_ID', 'TITLE is 201 bytes long, the maximum is 128']
+
+    """
+    problems = []
+    unknown = sorted(name for name in parameters if name not in SFO_PARAMETER_REGISTRY)
+    if unknown:
+        problems.append('Unknown parameters: %s' % ', '.join(unknown))
+
+    if category is None:
+        code = parameters.get('CATEGORY')
+        if code is None:
+            problems.append('Missing CATEGORY parameter')
+        else:
+            try:
+                category = SfoCategory.from_code(code)
+            except ValueError as ex:
+                problems.append(str(ex))
+    if category is not None:
+        missing = sorted(name for name in SFO_REQUIRED_PARAMETERS.get(category, ()) if name not in parameters)
+        if missing:
+            problems.append('Missing required parameters for %r: %s' % (category, ', '.join(missing)))
+
+    for name, value in parameters.items():
+        prototype = SFO_PARAMETER_REGISTRY.get(name)
+        if prototype is None:
+            continue
+        if prototype.fmt == SfoParameterFormat.int32:
+            if not isinstance(value, int):
+                problems.append('%s must be an integer, not %r' % (name, value))
+            elif not 0 <= value <= 0xFFFFFFFF:
+                problems.append('%s is outside the 32-bit range' % name)
+        elif not isinstance(value, str):
+            problems.append('%s must be a string, not %r' % (name, value))
+        else:
+            # utf8 values are stored with a null terminator
+            length = len(value.encode('utf8')) + (prototype.fmt == SfoParameterFormat.utf8)
+            if length > prototype.maxlength:
+                problems.append('%s is %d bytes long, the maximum is %d' % (name, length, prototype.maxlength))
+    return problems
@@ -6,7 +6,6 @@ from .test_sfo_file import TestSfo
 
 tmp_files = (
     Path(TestSfo.OUTFILE),
-    Path('NewTitle.SFO'),
 )
 
 pytest_args = [
@@ -0,0 +1,37 @@
+"""
+Compare the pure-Python and NumPy decoding of many SFO files by :class:`ps3iso.sfo.SfoTable`
+
+    python -m tests.benchmark_sfo_table [COUNT]
+"""
+import sys
+import time
+
+from ps3iso.sfo import SfoFile, SfoTable
+
+from .conftest import TEST_DATA
+
+
+def synthetic_buffers(count: int):
+    sfo = SfoFile.parse_file(TEST_DATA / 'PARAM.SFO')
+    buffers = []
+    for n in range(count):
+        sfo.set_parameter('TITLE_ID', 'BLES%05d' % n)
+        sfo.set_parameter('PARENTAL_LEVEL', n % 12)
+        buffers.append(bytes(sfo))
+    return buffers
+
+
+def benchmark(buffers, **kwargs) -> float:
+    start = time.perf_counter()
+    SfoTable.from_buffers(buffers, **kwargs)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    buffers = synthetic_buffers(count)
+    for keys in (None, {'TITLE_ID', 'PARENTAL_LEVEL'}):
+        python = benchmark(buffers, keys=keys, use_numpy=False)
+        vectorised = benchmark(buffers, keys=keys, use_numpy=True)
+        print('%d files, keys=%s: python %.2fs, numpy %.2fs (%.1fx)' % (
+            count, 'all' if keys is None else ','.join(sorted(keys)), python, vectorised, python / vectorised))
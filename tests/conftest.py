@@ -39,3 +39,143 @@ def game_object(sfo_file: Path) -> Game:
     game = Game('dummy.iso')
     game.sfo = SfoFile.parse_file(sfo_file)
     return game
+
+
+def make_iso(path: Path, files: dict) -> Path:
+    """
+    Write a minimal ISO9660 image containing the given files.
+    ``files`` maps absolute paths (e.g. ``/PS3_GAME/PARAM.SFO``) to their contents
+    """
+    import struct
+    sector = 2048
+
+    def both16(n):
+        return struct.pack('<H', n) + struct.pack('>H', n)
+
+    def both32(n):
+        return struct.pack('<I', n) + struct.pack('>I', n)
+
+    def record(name: bytes, extent: int, size: int, is_dir: bool) -> bytes:
+        rec = bytes([0, 0]) + both32(extent) + both32(size) + bytes(7) + bytes([0x02 if is_dir else 0, 0, 0])
+        rec += both16(1) + bytes([len(name)]) + name
+        if len(rec) % 2:
+            rec += b'\0'
+        return bytes([len(rec)]) + rec[1:]
+
+    # Collect directories, parents first
+    dirs = ['/']
+    for fpath in files:
+        parts = fpath.strip('/').split('/')[:-1]
+        for n in range(1, len(parts) + 1):
+            d = '/' + '/'.join(parts[:n])
+            if d not in dirs:
+                dirs.append(d)
+    dirs.sort(key=lambda d: (d.count('/') if d != '/' else 0, d))
+
+    def children(d):
+        prefix = d.rstrip('/') + '/'
+        for c in dirs:
+            if c != d and c.startswith(prefix) and '/' not in c[len(prefix):]:
+                yield c[len(prefix):].encode(), c, True
+        for f in files:
+            if f.startswith(prefix) and '/' not in f[len(prefix):]:
+                yield f[len(prefix):].encode() + b';1', f, False
+
+    def pack(records):
+        # Directory records may not span sector boundaries
+        body = b''
+        for rec in records:
+            if len(body) % sector + len(rec) > sector:
+                body += bytes(sector - len(body) % sector)
+            body += rec
+        return body
+
+    def path_table(endian, dir_lba):
+        table = b''
+        for d in dirs:
+            name = b'\0' if d == '/' else d.rsplit('/', 1)[1].encode()
+            parent = d.rsplit('/', 1)[0] or '/'
+            entry = bytes([len(name), 0]) + struct.pack(endian + 'IH', dir_lba[d], dirs.index(parent) + 1) + name
+            table += entry + (b'\0' if len(name) % 2 else b'')
+        return table
+
+    # Layout: 16 system sectors, PVD, terminator, L/M path tables, directories, then files
+    dir_size = {d: -(-len(pack(record(n, 0, 0, True) for n in [b'\0', b'\1', *(c[0] for c in children(d))])) // sector) * sector
+                for d in dirs}
+    table_sectors = -(-len(path_table('<', dict.fromkeys(dirs, 0))) // sector)
+    l_table_lba, m_table_lba = 18, 18 + table_sectors
+    lba = 18 + 2 * table_sectors
+    dir_lba = {}
+    for d in dirs:
+        dir_lba[d] = lba
+        lba += dir_size[d] // sector
+    file_lba = {}
+    for fpath, data in files.items():
+        file_lba[fpath] = lba
+        lba += max(1, -(-len(data) // sector))
+    total = lba
+
+    image = bytearray(total * sector)
+    for d in dirs:
+        parent = d.rsplit('/', 1)[0] or '/'
+        records = [record(b'\0', dir_lba[d], dir_size[d], True), record(b'\1', dir_lba[parent], dir_size[parent], True)]
+        for name, target, is_dir in sorted(children(d)):
+            if is_dir:
+                records.append(record(name, dir_lba[target], dir_size[target], True))
+            else:
+                records.append(record(name, file_lba[target], len(files[target]), False))
+        body = pack(records)
+        start = dir_lba[d] * sector
+        image[start:start + len(body)] = body
+    for fpath, data in files.items():
+        start = file_lba[fpath] * sector
+        image[start:start + len(data)] = data
+
+    l_table, m_table = path_table('<', dir_lba), path_table('>', dir_lba)
+    image[l_table_lba * sector:l_table_lba * sector + len(l_table)] = l_table
+    image[m_table_lba * sector:m_table_lba * sector + len(m_table)] = m_table
+
+    pvd = bytearray(sector)
+    pvd[0:7] = b'\x01CD001\x01'
+    pvd[80:88] = both32(total)
+    pvd[128:132] = both16(sector)
+    pvd[132:140] = both32(len(l_table))
+    pvd[140:144] = struct.pack('<I', l_table_lba)
+    pvd[148:152] = struct.pack('>I', m_table_lba)
+    pvd[156:190] = record(b'\0', dir_lba['/'], dir_size['/'], True)
+    image[16 * sector:17 * sector] = pvd
+    image[17 * sector:17 * sector + 7] = b'\xffCD001\x01'
+
+    path.write_bytes(bytes(image))
+    return path
+
+
+@pytest.fixture
+def iso_file(tmp_path: Path, sfo_file: Path) -> Path:
+    files = {
+        '/PS3_DISC.SFB': b'\0' * 64,
+        '/PS3_GAME/PARAM.SFO': sfo_file.read_bytes(),
+        '/PS3_GAME/USRDIR/EBOOT.BIN': b'\0' * 4096,
+    }
+    return make_iso(tmp_path / 'Example Game.iso', files)
+
+
+@pytest.fixture
+def fake_isoinfo(tmp_path: Path, sfo_file: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Install an ``isoinfo`` script in the PATH, which extracts PARAM.SFO from any image
+    """
+    import os
+    import sys
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    script = bindir / 'isoinfo'
+    script.write_text(
+        f'#!{sys.executable}\n'
+        'import sys\n'
+        f'if sys.argv[-1] == "/PS3_GAME/PARAM.SFO;1":\n'
+        f'    sys.stdout.buffer.write(open({str(sfo_file.resolve())!r}, "rb").read())\n'
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(bindir) + os.pathsep + os.environ.get('PATH', ''))
+    return script
@@ -0,0 +1,126 @@
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from ps3iso.cache import SfoCache
+from ps3iso.game import Game
+from ps3iso.iso9660 import IsoImage
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> SfoCache:
+    with SfoCache(tmp_path / 'cache' / 'sfo.sqlite3') as cache:
+        yield cache
+
+
+def test_default_path(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert SfoCache.default_path() == tmp_path / 'ps3iso' / 'sfo.sqlite3'
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    assert SfoCache.default_path() == Path.home() / '.cache' / 'ps3iso' / 'sfo.sqlite3'
+
+
+def test_get_put(cache: SfoCache, tmp_path: Path):
+    f = tmp_path / 'game.iso'
+    f.write_bytes(b'image')
+    assert cache.get(f) is None
+    cache.put(f, b'sfo', {'TITLE_ID': 'BLES00000', 'BOOTABLE': 1})
+    assert cache.get(f) == b'sfo'
+    assert cache.get_parameters(f) == {'TITLE_ID': 'BLES00000', 'BOOTABLE': 1}
+    # Renamed files keep their identity
+    f = f.rename(tmp_path / 'renamed.iso')
+    assert cache.get(f) == b'sfo'
+    # Modified files do not
+    f.write_bytes(b'changed image')
+    assert cache.get(f) is None
+
+
+def test_refresh(tmp_path: Path):
+    f = tmp_path / 'game.iso'
+    f.write_bytes(b'image')
+    db = tmp_path / 'sfo.sqlite3'
+    with SfoCache(db) as cache:
+        cache.put(f, b'sfo', {})
+    with SfoCache(db, refresh=True) as cache:
+        assert cache.get(f) is None
+    with SfoCache(db) as cache:
+        assert cache.get(f) == b'sfo'
+
+
+def test_prune(cache: SfoCache, tmp_path: Path):
+    files = []
+    for n in range(5):
+        f = tmp_path / ('game%d.iso' % n)
+        f.write_bytes(b'x' * n)
+        cache.put(f, b'sfo%d' % n, {})
+        files.append(f)
+    assert len(cache) == 5
+    # Recently used entries are kept
+    cache.get(files[0])
+    cache.flush()
+    assert cache.prune(2) == 3
+    assert cache.get(files[0]) == b'sfo0'
+    assert cache.get(files[4]) == b'sfo4'
+    assert cache.get(files[1]) is None
+
+
+def test_shared_between_connections(tmp_path: Path):
+    f = tmp_path / 'game.iso'
+    f.write_bytes(b'image')
+    db = tmp_path / 'sfo.sqlite3'
+    with SfoCache(db) as first, SfoCache(db) as second:
+        first.put(f, b'sfo', {})
+        assert second.get(f) == b'sfo'
+
+        def put(n):
+            g = tmp_path / ('game%d.iso' % n)
+            g.write_bytes(b'x' * n)
+            (first if n % 2 else second).put(g, b'sfo', {})
+
+        threads = [threading.Thread(target=put, args=(n,)) for n in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(first) == 21
+
+
+def test_game_uses_cache(cache: SfoCache, iso_file: Path, sfo_data: dict, monkeypatch: pytest.MonkeyPatch):
+    assert Game(iso_file, cache=cache).sfo.parameters._asdict() == sfo_data
+    assert cache.get_parameters(iso_file) == sfo_data
+
+    def fail(*args):
+        raise AssertionError('Image should not be opened')
+
+    monkeypatch.setattr(IsoImage, 'open', fail)
+    assert Game(iso_file, cache=cache).sfo.parameters._asdict() == sfo_data
+    assert [g.sfo.parameters.TITLE_ID for g in Game.search(iso_file.parent, jobs=2, cache=cache)] == ['BLES00000']
+
+    # A modified image is read again
+    os.utime(iso_file, ns=(0, 0))
+    with pytest.raises(AssertionError):
+        Game(iso_file, cache=cache).sfo
+
+
+def test_projected_game_fills_cache(cache: SfoCache, iso_file: Path, sfo_data: dict):
+    game, = Game.search(iso_file.parent, cache=cache, keys={'TITLE_ID'})
+    assert game.sfo.parameters._asdict() == {'TITLE_ID': sfo_data['TITLE_ID']}
+    assert cache.get_parameters(iso_file) == {'TITLE_ID': sfo_data['TITLE_ID']}
+    game, = Game.search(iso_file.parent, cache=cache, keys={'TITLE'})
+    assert game.sfo.keys == ['TITLE']
+
+
+def test_invalid_sfo_not_cached(cache: SfoCache, tmp_path: Path, sfo_file: Path):
+    from .conftest import make_iso
+    from ps3iso.sfo.errors import SfoParseError
+    data = sfo_file.read_bytes().replace(b'Example PS3ISO', b'\xff' * 14)
+    iso = make_iso(tmp_path / 'broken.iso', {'/PS3_GAME/PARAM.SFO': data})
+    with pytest.raises(SfoParseError, match='broken.iso'):
+        Game(iso, cache=cache).sfo
+    assert cache.get(iso) is None
+    # Only the parameters which were read are decoded
+    game, = Game.search(tmp_path, cache=cache, keys={'TITLE_ID'})
+    assert game.sfo.parameters.TITLE_ID == 'BLES00000'
+    assert cache.get_parameters(iso) == {'TITLE_ID': 'BLES00000'}
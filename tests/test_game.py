@@ -1,4 +1,5 @@
 import json
+import asyncio
 from pathlib import Path
 
 import pytest
@@ -26,3 +27,259 @@ def test_print_info_json(game_object: Game, sfo_data: dict, capfd: pytest.Captur
     out = json.loads(out)
     assert out['title'] == sfo_data['TITLE']
     assert out['id'] == sfo_data['TITLE_ID']
+
+
+def test_search_jobs(tmp_path: Path, sfo_file: Path):
+    from .conftest import make_iso
+    sfo = sfo_file.read_bytes()
+    for n in range(8):
+        make_iso(tmp_path / ('game%d.iso' % n), {'/PS3_GAME/PARAM.SFO': sfo})
+    serial = [g.iso for g in Game.search(tmp_path)]
+    assert len(serial) == 8
+    assert [g.iso for g in Game.search(tmp_path, jobs=4)] == serial
+    unordered = list(Game.search(tmp_path, jobs=4, ordered=False))
+    assert sorted(g.iso for g in unordered) == serial
+    assert all(g.sfo.parameters.TITLE_ID == 'BLES00000' for g in unordered)
+
+
+def test_extract_sfo_isoinfo_fallback(tmp_path: Path, fake_isoinfo: Path, sfo_data: dict):
+    # Not a valid ISO9660 image, so isoinfo is used instead
+    iso = tmp_path / 'unreadable.iso'
+    iso.write_bytes(bytes(64))
+    assert Game.extract_sfo(iso).parameters._asdict() == sfo_data
+    assert asyncio.run(Game.aextract_sfo(iso)).parameters._asdict() == sfo_data
+
+
+def test_extract_sfo_no_fallback(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    from ps3iso.iso9660 import IsoError
+    monkeypatch.setenv('PATH', str(tmp_path))
+    iso = tmp_path / 'unreadable.iso'
+    iso.write_bytes(bytes(64))
+    with pytest.raises(IsoError):
+        Game.extract_sfo(iso)
+    with pytest.raises(IsoError):
+        asyncio.run(Game.aextract_sfo(iso))
+
+
+def test_asearch(tmp_path: Path, sfo_file: Path):
+    from .conftest import make_iso
+    sfo = sfo_file.read_bytes()
+    for n in range(6):
+        make_iso(tmp_path / ('game%d.iso' % n), {'/PS3_GAME/PARAM.SFO': sfo})
+
+    async def scan():
+        return [game async for game in Game.asearch(tmp_path, concurrency=2)]
+
+    games = asyncio.run(scan())
+    assert sorted(g.iso for g in games) == [g.iso for g in Game.search(tmp_path)]
+    assert all(g.sfo.parameters.TITLE_ID == 'BLES00000' for g in games)
+
+
+def test_asearch_timeout_and_cancel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    for n in range(4):
+        (tmp_path / ('game%d.iso' % n)).touch()
+    cancelled = []
+
+    async def slow_extract(iso_path, **kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(iso_path)
+            raise
+
+    monkeypatch.setattr(Game, 'aextract_sfo', staticmethod(slow_extract))
+
+    async def scan_with_timeout():
+        return [game async for game in Game.asearch(tmp_path, timeout=0.01)]
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scan_with_timeout())
+
+    async def scan_and_close():
+        cancelled.clear()
+        agen = Game.asearch(tmp_path, concurrency=2)
+        task = asyncio.ensure_future(agen.__anext__())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await agen.aclose()
+
+    asyncio.run(scan_and_close())
+    assert len(cancelled) == 2
+
+
+def test_asearch_skip_timeouts(tmp_path: Path, sfo_file: Path, monkeypatch: pytest.MonkeyPatch):
+    from .conftest import make_iso
+    sfo = sfo_file.read_bytes()
+    for n in range(4):
+        make_iso(tmp_path / ('game%d.iso' % n), {'/PS3_GAME/PARAM.SFO': sfo})
+    extract = Game.aextract_sfo
+
+    async def stalling_extract(iso_path, **kwargs):
+        if iso_path.name == 'game2.iso':
+            await asyncio.sleep(10)
+        return await extract(iso_path, **kwargs)
+
+    monkeypatch.setattr(Game, 'aextract_sfo', staticmethod(stalling_extract))
+    skipped = []
+
+    async def scan():
+        return [game async for game in Game.asearch(tmp_path, concurrency=2, timeout=0.5, errors='skip',
+                                                    on_error=lambda game, ex: skipped.append((game, ex)))]
+
+    games = asyncio.run(scan())
+    assert sorted(g.iso.name for g in games) == ['game0.iso', 'game1.iso', 'game3.iso']
+    assert all(g.sfo.parameters.TITLE_ID == 'BLES00000' for g in games)
+    assert [g.iso.name for g, _ in skipped] == ['game2.iso']
+    assert isinstance(skipped[0][1], asyncio.TimeoutError)
+
+
+def test_search_recursive(tmp_path: Path, sfo_file: Path):
+    from .conftest import make_iso
+    sfo = sfo_file.read_bytes()
+    (tmp_path / 'EU' / 'A').mkdir(parents=True)
+    for f in ('top.iso', 'EU/eu.iso', 'EU/A/deep.iso'):
+        make_iso(tmp_path / f, {'/PS3_GAME/PARAM.SFO': sfo})
+
+    def found(**kwargs):
+        return [g.iso.name for g in Game.search(tmp_path, **kwargs)]
+
+    assert found() == ['top.iso']
+    assert found(recursive=True) == ['top.iso', 'eu.iso', 'deep.iso']
+    assert found(recursive=True, max_depth=1) == ['top.iso', 'eu.iso']
+    assert sorted(found(recursive=True, jobs=2, ordered=False)) == ['deep.iso', 'eu.iso', 'top.iso']
+
+    async def scan():
+        return [g.iso.name async for g in Game.asearch(tmp_path, recursive=True)]
+
+    assert sorted(asyncio.run(scan())) == ['deep.iso', 'eu.iso', 'top.iso']
+
+
+def test_search_symlinked_iso(tmp_path: Path, sfo_file: Path):
+    from .conftest import make_iso
+    (tmp_path / 'store').mkdir()
+    (tmp_path / 'lib').mkdir()
+    make_iso(tmp_path / 'store' / 'real.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    (tmp_path / 'lib' / 'linked.iso').symlink_to(Path('..') / 'store' / 'real.iso')
+    games = list(Game.search(tmp_path / 'lib', cache=None))
+    assert [g.iso.name for g in games] == ['linked.iso']
+    assert games[0].sfo.parameters.TITLE_ID == 'BLES00000'
+
+
+def test_search_companion_files(tmp_path: Path, sfo_file: Path, monkeypatch: pytest.MonkeyPatch):
+    from .conftest import make_iso
+    make_iso(tmp_path / 'Game.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    for f in ('Game.cue', 'Game.iso.md5', 'Game 2.png', 'Other.nfo'):
+        (tmp_path / f).touch()
+
+    # The directory listing from the search is reused instead of a glob per game
+    monkeypatch.setattr(Path, 'glob', None)
+    game, = Game.search(tmp_path)
+    assert sorted(f.name for f in game.files) == ['Game.cue', 'Game.iso', 'Game.iso.md5']
+    monkeypatch.undo()
+    assert Game(tmp_path / 'Game.iso').files == game.files
+
+
+def test_lazy_game(tmp_path: Path, sfo_file: Path, monkeypatch: pytest.MonkeyPatch):
+    from .conftest import make_iso
+    from ps3iso.iso9660 import IsoImage, SECTOR_SIZE
+    make_iso(tmp_path / 'Small.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    make_iso(tmp_path / 'Large.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes(), '/PS3_GAME/DATA': bytes(SECTOR_SIZE * 4)})
+    opened = []
+    monkeypatch.setattr(IsoImage, 'open', lambda path, _open=IsoImage.open: opened.append(path) or _open(path))
+
+    # Nothing is read until the SFO data is first accessed
+    games = list(Game.search(tmp_path))
+    assert [g.iso.name for g in games] == ['Large.iso', 'Small.iso']
+    game = Game(tmp_path / 'Small.iso')
+    assert opened == []
+    assert game.sfo.parameters.TITLE_ID == 'BLES00000'
+    assert game.sfo is game.sfo
+    assert opened == [tmp_path / 'Small.iso']
+
+    # Predicates are applied before reading
+    opened.clear()
+    games = list(Game.search(tmp_path, jobs=2, predicate=lambda g: g.size > 50000))
+    assert [g.iso.name for g in games] == ['Large.iso']
+    assert opened == [tmp_path / 'Large.iso']
+    assert Game.from_path('Missing.iso').load().sfo.parameters._asdict() == {}
+
+
+def test_patch_sfo(iso_file: Path, tmp_path: Path, sfo_data: dict):
+    from ps3iso.iso9660 import IsoError, restore_image
+    original = iso_file.read_bytes()
+    game = Game(iso_file)
+    assert game.sfo.parameters.TITLE == sfo_data['TITLE']
+
+    # Values which fit are patched in place, with a backup of only the sectors written
+    assert game.patch_sfo(backup=tmp_path / 'backup', TITLE='Fixed Title', APP_VER='01.01')
+    assert game.sfo.format('%T %A') == 'Fixed Title 01.01'
+    assert (tmp_path / 'backup').stat().st_size < 3 * 2048
+    changed = iso_file.read_bytes()
+    assert len(changed) == len(original)
+    assert sum(a != b for a, b in zip(changed, original)) < 32
+
+    # New parameters rewrite the PARAM.SFO within its allocated sectors, updating the directory record
+    assert not game.patch_sfo(backup=tmp_path / 'backup2', REGION_DENY=1)
+    assert Game(iso_file).sfo.parameters.REGION_DENY == 1
+    assert Game(iso_file).sfo.parameters.TITLE == 'Fixed Title'
+    with pytest.raises(IsoError):
+        game.patch_sfo(PARAMS='x')
+    assert Game(iso_file).sfo.parameters.REGION_DENY == 1
+
+    restore_image(iso_file, tmp_path / 'backup2')
+    assert iso_file.read_bytes() == changed
+    restore_image(iso_file, tmp_path / 'backup')
+    assert iso_file.read_bytes() == original
+
+
+def test_patch_sfo_bounds(tmp_path: Path, sfo_file: Path):
+    import struct
+    from .conftest import make_iso
+    from ps3iso.sfo import SfoFile
+    data = bytearray(sfo_file.read_bytes())
+    sfo = SfoFile.parse(bytes(data))
+    # The last value (VERSION) claims a slot running past the end of the PARAM.SFO, into the next file
+    entry = 20 + 16 * sfo.keys.index('VERSION')
+    struct.pack_into('<I', data, entry + 8, 4096)
+    iso = make_iso(tmp_path / 'game.iso', {'/PS3_GAME/PARAM.SFO': bytes(data), '/PS3_GAME/X.BIN': b'\xff' * 64})
+    original = iso.read_bytes()
+    other = original.index(b'\xff' * 64)
+
+    game = Game(iso)
+    assert not game.patch_sfo(VERSION='02.00')
+    assert game.sfo.parameters.VERSION == '02.00'
+    assert iso.read_bytes()[other:] == original[other:]
+
+    # Multibyte values are written in place only if their encoded length fits
+    assert game.patch_sfo(TITLE='é' * 63)
+    assert game.sfo.format('%T %I') == 'é' * 63 + ' BLES00000'
+    with pytest.raises(ValueError):
+        game.patch_sfo(TITLE='é' * 127)
+    assert iso.read_bytes()[other:] == original[other:]
+
+
+def test_validate_all(tmp_path: Path, sfo_file: Path, capfd: pytest.CaptureFixture):
+    from .conftest import make_iso, TEST_DATA
+    from ps3iso.__main__ import main
+    make_iso(tmp_path / 'a.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    make_iso(tmp_path / 'b.iso', {'/PS3_GAME/PARAM.SFO': (TEST_DATA / 'PARAM.SFO.invalid_ps3').read_bytes()})
+    make_iso(tmp_path / 'c.iso', {'/PS3_GAME/PARAM.SFO': (TEST_DATA / 'PARAM.SFO.broken-magic').read_bytes()})
+    (tmp_path / 'd.iso').write_bytes(b'not an image')
+    # A key which is not valid UTF-8
+    corrupted = sfo_file.read_bytes().replace(b'TITLE_ID\0', b'TITLE_\xffD\0')
+    make_iso(tmp_path / 'e.iso', {'/PS3_GAME/PARAM.SFO': corrupted})
+    results = list(Game.validate_all(Game.search(tmp_path), jobs=2))
+    assert [game.iso.name for game, problems in results] == ['a.iso', 'b.iso', 'c.iso', 'd.iso', 'e.iso']
+    assert [len(problems) for game, problems in results] == [0, 1, 1, 1, 1]
+    assert all(problem.startswith('Unable to read SFO data') for game, problems in results[2:] for problem in problems)
+
+    with pytest.raises(SystemExit) as ex:
+        main(['validate', '-i', str(tmp_path), '-j', '2', '--no-cache'])
+    assert ex.value.code == 1
+    out = capfd.readouterr().out.splitlines()
+    assert len(out) == 5
+    assert out[-1] == '4 of 5 images failed validation'
+    main(['validate', '-i', str(tmp_path / 'a.iso'), '--no-cache'])
+    assert capfd.readouterr().out == '0 of 1 images failed validation\n'
@@ -0,0 +1,85 @@
+from pathlib import Path
+
+import pytest
+
+from ps3iso.game import Game
+from ps3iso.iso9660 import IsoImage, IsoError, IsoFileNotFoundError
+
+from .conftest import make_iso
+
+
+def test_find(iso_file: Path):
+    with IsoImage.open(iso_file) as image:
+        record = image.find('/PS3_GAME/PARAM.SFO')
+        assert record is not None and not record.is_dir
+        # Lookups ignore case and version suffixes
+        assert image.find('/ps3_game/param.sfo;1').extent == record.extent
+        assert image.find('/PS3_GAME').is_dir
+        assert image.find('/PS3_GAME/MISSING') is None
+        assert image.find('/PS3_DISC.SFB/PARAM.SFO') is None
+
+
+def test_read_file(iso_file: Path, sfo_file: Path):
+    with IsoImage.open(iso_file) as image:
+        assert image.read_file('/PS3_GAME/PARAM.SFO') == sfo_file.read_bytes()
+        with pytest.raises(IsoFileNotFoundError):
+            image.read_file('/PSP_GAME/PARAM.SFO')
+
+
+def test_not_an_iso(tmp_path: Path, sfo_file: Path):
+    with pytest.raises(IsoError):
+        IsoImage.open(sfo_file)
+    empty = tmp_path / 'empty.iso'
+    empty.touch()
+    with pytest.raises(IsoError):
+        IsoImage.open(empty)
+
+
+def test_view(iso_file: Path, sfo_file: Path):
+    with iso_file.open('rb') as f:
+        image = IsoImage(f.read())
+    data = image.read_file('/PS3_GAME/PARAM.SFO')
+    assert isinstance(data, memoryview)
+    assert data == sfo_file.read_bytes()
+    with pytest.raises(IsoError):
+        image.view(image.root.extent, len(iso_file.read_bytes()))
+
+
+def test_close_with_exported_views(iso_file: Path, sfo_file: Path):
+    with Game(iso_file).open_image() as image:
+        data = image.read_file('/PS3_GAME/PARAM.SFO')
+    # Views outlive the image object
+    assert data == sfo_file.read_bytes()
+
+
+def test_extract_sfo(iso_file: Path, sfo_data: dict):
+    game = Game(iso_file)
+    assert game.sfo.parameters._asdict() == sfo_data
+
+
+def test_extract_sfo_psp(tmp_path: Path, sfo_file: Path, sfo_data: dict):
+    iso = make_iso(tmp_path / 'psp.iso', {'/PSP_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    assert Game.extract_sfo(iso).parameters._asdict() == sfo_data
+
+
+def test_find_large_tree(tmp_path: Path, sfo_file: Path):
+    # Enough directories for the path table to span several sectors
+    files = {'/PS3_GAME/USRDIR/DIR%03d/DATA.BIN' % n: b'\0' for n in range(300)}
+    files['/PS3_GAME/PARAM.SFO'] = sfo_file.read_bytes()
+    files['/PS3_GAME/USRDIR/DIR299/NESTED.BIN'] = b'\1'
+    iso = make_iso(tmp_path / 'large.iso', files)
+
+    with IsoImage.open(iso) as image:
+        reads = []
+        view = image.view
+        image.view = lambda lba, length: reads.append(lba) or view(lba, length)
+        assert image.read_file('/PS3_GAME/PARAM.SFO') == sfo_file.read_bytes()
+        # Only the first path table sector, the PS3_GAME directory and the file itself are touched
+        assert len(reads) <= 4
+        assert image.read_file('/PS3_GAME/USRDIR/DIR299/NESTED.BIN') == b'\1'
+        assert image.find('/PS3_GAME/USRDIR/DIR300/DATA.BIN') is None
+
+        # Results match a plain walk of the directory records
+        image._path_table_size = 0
+        assert image.read_file('/PS3_GAME/USRDIR/DIR299/NESTED.BIN') == b'\1'
+        assert image.find('/PS3_GAME/USRDIR/DIR300/DATA.BIN') is None
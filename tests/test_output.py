@@ -0,0 +1,79 @@
+import io
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from ps3iso.game import Game
+from ps3iso.output import DEFAULT_COLUMNS, CsvWriter, JsonLinesWriter, NullWriter, OutputWriter, open_writer
+from ps3iso.sfo import FormatTemplate, SfoFile
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+@pytest.fixture
+def games(sfo_file: Path) -> list:
+    sfo = SfoFile.parse_file(sfo_file)
+    return [Game.from_path('/isos/game%d.iso' % n, sfo=sfo) for n in range(10)]
+
+
+def test_jsonl(games: list, sfo_data: dict):
+    stream = CountingStream()
+    with JsonLinesWriter(stream, batch_size=4, interval=60) as writer:
+        assert writer.write_all(games) == 10
+        # Two full batches have been written, the rest are written on close
+        assert stream.writes == 2
+    assert stream.writes == 3
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[3] == {'path': '/isos/game3.iso', **sfo_data}
+
+
+def test_csv(games: list, sfo_data: dict):
+    stream = io.StringIO()
+    with open_writer('tsv', stream) as writer:
+        writer.write_all(games)
+    rows = list(csv.reader(io.StringIO(stream.getvalue()), delimiter='\t'))
+    assert rows[0] == ['path', *DEFAULT_COLUMNS]
+    assert len(rows) == 11
+    assert rows[1] == ['/isos/game0.iso', *(str(sfo_data.get(key, '')) for key in DEFAULT_COLUMNS)]
+
+    stream = io.StringIO()
+    with open_writer('csv', stream, FormatTemplate('%T [%I]')) as writer:
+        assert isinstance(writer, CsvWriter)
+        assert writer.keys == ('TITLE', 'TITLE_ID')
+        writer.write(games[0])
+    assert stream.getvalue() == 'path,TITLE,TITLE_ID\n/isos/game0.iso,Example PS3ISO Game Title,BLES00000\n'
+
+
+def test_null(games: list):
+    stream = io.StringIO()
+    with open_writer('null', stream) as writer:
+        assert writer.keys == ()
+        writer.write_all(games[:2])
+    assert stream.getvalue() == '/isos/game0.iso\0/isos/game1.iso\0'
+    stream = io.StringIO()
+    with NullWriter(stream, template=FormatTemplate('%I %f', file_variables=True)) as writer:
+        writer.write(games[0])
+    assert stream.getvalue() == 'BLES00000 game0.iso\0'
+    # The base class has no record format of its own
+    with pytest.raises(TypeError):
+        OutputWriter(io.StringIO())
+
+
+def test_output_argument(tmp_path: Path, sfo_file: Path, capfd: pytest.CaptureFixture):
+    from .conftest import make_iso
+    from ps3iso.__main__ import main
+    for n in range(3):
+        make_iso(tmp_path / ('game%d.iso' % n), {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    main(['-i', str(tmp_path), '-o', 'jsonl', '-f', '%I', '-j', '2', '--no-cache'])
+    records = [json.loads(line) for line in capfd.readouterr().out.splitlines()]
+    assert records == [{'path': str(tmp_path / ('game%d.iso' % n)), 'TITLE_ID': 'BLES00000'} for n in range(3)]
@@ -0,0 +1,133 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ps3iso.rename import RenameJournal, RenameJournalError
+
+
+def make_files(directory: Path, count: int) -> list:
+    plan = []
+    for n in range(count):
+        (directory / ('src%d.iso' % n)).write_text(str(n))
+        plan.append((directory / ('src%d.iso' % n), directory / ('dst%d.iso' % n)))
+    return plan
+
+
+def test_resume(tmp_path: Path):
+    plan = make_files(tmp_path, 6)
+    journal_path = tmp_path / 'journal.jsonl'
+    journal = RenameJournal.create(journal_path, plan, checkpoint=2)
+    results = journal.run()
+    # Interrupted after two steps, and a third carried out but never recorded
+    assert [next(results)[2], next(results)[2]] == [None, None]
+    plan[2][0].rename(plan[2][1])
+    results.close()
+    journal.close()
+    with journal_path.open('a') as f:
+        f.write('{"done": ')
+
+    with RenameJournal.load(journal_path) as journal:
+        assert journal.pending == [2, 3, 4, 5]
+        assert [error for src, dst, error in journal.run(jobs=3)] == [None] * 4
+        assert journal.pending == []
+    assert sorted(p.name for p in tmp_path.glob('*.iso')) == ['dst%d.iso' % n for n in range(6)]
+    # The incomplete line was discarded before appending
+    assert all(json.loads(line) for line in journal_path.read_text().splitlines())
+
+    with RenameJournal.load(journal_path) as journal:
+        assert [error for src, dst, error in journal.rollback()] == [None] * 6
+    assert all(src.read_text() == str(n) for n, (src, dst) in enumerate(plan))
+    assert RenameJournal.load(journal_path).pending == list(range(6))
+
+
+def test_existing_target(tmp_path: Path):
+    plan = make_files(tmp_path, 2)
+    plan[1][1].write_text('existing')
+    with RenameJournal.create(tmp_path / 'journal.jsonl', plan) as journal:
+        results = list(journal.run())
+        assert [error is None for src, dst, error in results] == [True, False]
+        assert isinstance(results[1][2], FileExistsError)
+        assert journal.pending == [1]
+    assert plan[1][1].read_text() == 'existing'
+    with pytest.raises(FileExistsError):
+        RenameJournal.create(tmp_path / 'journal.jsonl', plan)
+    (tmp_path / 'partial.jsonl').write_text('{"version": 1, "steps": 2}\n')
+    with pytest.raises(RenameJournalError):
+        RenameJournal.load(tmp_path / 'partial.jsonl')
+
+
+def test_rename_journal_arguments(tmp_path: Path, sfo_file: Path, capfd: pytest.CaptureFixture):
+    from .conftest import make_iso
+    from ps3iso.__main__ import main
+    make_iso(tmp_path / 'game.iso', {'/PS3_GAME/PARAM.SFO': sfo_file.read_bytes()})
+    (tmp_path / 'game.png').write_bytes(b'png')
+    journal = tmp_path / 'rename.jsonl'
+    main(['-i', str(tmp_path), '-f', '%I', '--rename', '--journal', str(journal), '--no-cache'])
+    assert sorted(p.name for p in tmp_path.glob('*.*')) == ['BLES00000.iso', 'BLES00000.png', 'rename.jsonl']
+    with pytest.raises(SystemExit):
+        main(['-i', str(tmp_path), '-f', '%I', '--rename', '--journal', str(journal)])
+    main(['--journal', str(journal), '--rollback'])
+    assert sorted(p.name for p in tmp_path.glob('*.*')) == ['game.iso', 'game.png', 'rename.jsonl']
+    main(['--journal', str(journal), '--resume', '-j', '2'])
+    assert sorted(p.name for p in tmp_path.glob('*.*')) == ['BLES00000.iso', 'BLES00000.png', 'rename.jsonl']
+    capfd.readouterr()
+
+
+def test_plan_renames(tmp_path: Path):
+    from ps3iso.rename import plan_renames
+    for name in ('a', 'b', 'c', 'd', 'x', 'y', 'existing'):
+        (tmp_path / name).write_text(name)
+    renames = [
+        ('a', 'b'), ('b', 'c'), ('c', 'a'),  # Cycle
+        ('x', 'y'), ('y', 'z'),  # Chain ending at a free name
+        ('d', 'existing'),  # Existing file which is not renamed
+        ('e', 'new'), ('f', 'new'),  # Duplicate target
+    ]
+    plan = plan_renames((tmp_path / src, tmp_path / dst) for src, dst in renames)
+    assert sorted((src.name, dst.name) for src, dst in plan.conflicts) == [
+        ('d', 'existing'), ('e', 'new'), ('f', 'new')]
+    assert [(src.name, dst.name) for src, dst in plan.steps] == [
+        ('a', '.a.ps3iso-0'), ('c', 'a'), ('b', 'c'), ('.a.ps3iso-0', 'b'), ('y', 'z'), ('x', 'y')]
+
+    with RenameJournal.create(tmp_path / 'journal.jsonl', plan.steps) as journal:
+        assert [error for src, dst, error in journal.run(jobs=4)] == [None] * 6
+    assert {p.name: p.read_text() for p in tmp_path.iterdir() if p.name != 'journal.jsonl'} == {
+        'a': 'c', 'b': 'a', 'c': 'b', 'd': 'd', 'existing': 'existing', 'y': 'x', 'z': 'y'}
+    with RenameJournal.load(tmp_path / 'journal.jsonl') as journal:
+        assert [error for src, dst, error in journal.rollback(jobs=4)] == [None] * 6
+    assert all(p.read_text() == p.name for p in tmp_path.iterdir() if p.name != 'journal.jsonl')
+
+    # Refusing a rename blocks the chain ending at its source
+    plan = plan_renames([(tmp_path / 'x', tmp_path / 'd'), (tmp_path / 'd', tmp_path / 'existing')])
+    assert plan.steps == []
+    assert len(plan.conflicts) == 2
+
+
+def test_rename_all(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    import ps3iso.game
+    from ps3iso.game import Game
+    for name in ('a.iso', 'b.iso', 'x.iso'):
+        (tmp_path / name).write_text(name)
+    targets = {'a.iso': 'b.iso', 'b.iso': 'a.iso', 'x.iso': 'missing/y.iso'}
+    monkeypatch.setattr(Game, 'format_file', lambda self, f, fmt: tmp_path / targets[f.name])
+    games = []
+    for name in targets:
+        game = Game(tmp_path / name)
+        game.files = {game.iso}
+        games.append(game)
+
+    # The swap takes three steps, but renames two files, and the rename to a missing directory fails
+    assert Game.rename_all(games, '%I') == 2
+    assert {p.name: p.read_text() for p in tmp_path.iterdir()} == {'a.iso': 'b.iso', 'b.iso': 'a.iso', 'x.iso': 'x.iso'}
+    assert 'missing/y.iso: failed' in capsys.readouterr().out
+
+    def fail_from_temporary(src, dst):
+        if src.name.startswith('.'):
+            raise PermissionError(13, 'Permission denied')
+        move(src, dst)
+
+    move = ps3iso.game._move
+    monkeypatch.setattr(ps3iso.game, '_move', fail_from_temporary)
+    assert Game.rename_all(games[:2], '%I') == 1
+    assert 'Files left at temporary names:\n\t%s' % (tmp_path / '.a.iso.ps3iso-0') in capsys.readouterr().out
@@ -0,0 +1,140 @@
+import os
+import glob
+import threading
+import time
+
+import pytest
+
+from ps3iso.scan import parallel_map, walk
+
+
+def test_parallel_map_ordered():
+    def slow(n):
+        time.sleep(0.001 * (10 - n))
+        return n * 2
+    assert list(parallel_map(slow, range(10), jobs=4)) == [n * 2 for n in range(10)]
+    assert list(parallel_map(slow, range(10), jobs=1)) == [n * 2 for n in range(10)]
+
+
+def test_parallel_map_unordered():
+    release = threading.Event()
+
+    def fn(n):
+        if n == 0:
+            release.wait(5)
+        return n
+
+    results = []
+    for n in parallel_map(fn, range(6), jobs=3, ordered=False):
+        results.append(n)
+        release.set()
+    # The blocked first item does not hold back the others
+    assert results[0] != 0
+    assert sorted(results) == list(range(6))
+
+
+def test_parallel_map_concurrency():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fn(n):
+        with lock:
+            active.append(n)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(n)
+        return n
+
+    assert sorted(parallel_map(fn, range(12), jobs=4)) == list(range(12))
+    assert 1 < max(peak) <= 4
+
+
+def test_parallel_map_exceptions():
+    def fn(n):
+        if n == 3:
+            raise ValueError(n)
+        return n
+
+    results = []
+    with pytest.raises(ValueError):
+        for n in parallel_map(fn, range(100), jobs=4):
+            results.append(n)
+    assert results == [0, 1, 2]
+
+
+def test_parallel_map_lazy_input():
+    consumed = []
+
+    def source():
+        for n in range(1000):
+            consumed.append(n)
+            yield n
+
+    gen = parallel_map(lambda n: n, source(), jobs=2)
+    assert next(gen) == 0
+    gen.close()
+    # Only a small window of the input is read ahead
+    assert len(consumed) < 10
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for d in ('', 'EU', 'EU/A', 'US', 'US/B/C'):
+        (tmp_path / d).mkdir(parents=True, exist_ok=True)
+    for f in ('top.iso', 'notes.txt', 'EU/a.ISO', 'EU/A/b.iso', 'US/c.iso', 'US/B/C/d.iso'):
+        (tmp_path / f).write_bytes(b'x' * len(f))
+    return tmp_path
+
+
+def test_walk(tree):
+    def rel(**kwargs):
+        return [os.path.relpath(e.path, str(tree)) for e, _ in walk(tree, **kwargs)]
+
+    assert rel() == ['top.iso']
+    assert rel(max_depth=1) == ['top.iso', os.path.join('EU', 'a.ISO'), os.path.join('US', 'c.iso')]
+    assert rel(max_depth=None) == [
+        'top.iso',
+        os.path.join('EU', 'a.ISO'),
+        os.path.join('EU', 'A', 'b.iso'),
+        os.path.join('US', 'c.iso'),
+        os.path.join('US', 'B', 'C', 'd.iso'),
+    ]
+    # Stat data comes with the entries
+    entry, index = next(walk(tree))
+    assert entry.stat().st_size == len('top.iso')
+
+
+def test_walk_symlinks(tree):
+    os.symlink(str(tree / 'US'), str(tree / 'EU' / 'link'))
+    os.symlink(str(tree), str(tree / 'US' / 'loop'))
+    os.symlink(str(tree / 'top.iso'), str(tree / 'EU' / 'linked.iso'))
+    found = [os.path.relpath(e.path, str(tree)) for e, _ in walk(tree, max_depth=None)]
+    assert os.path.join('EU', 'link', 'c.iso') not in found
+    # Links to files are found without following directory links, like Path.glob
+    assert os.path.join('EU', 'linked.iso') in found
+
+    found = [os.path.relpath(e.path, str(tree)) for e, _ in walk(tree, max_depth=None, follow_symlinks=True)]
+    assert os.path.join('EU', 'linked.iso') in found
+    # Each directory is only visited once, even through a symlink loop
+    assert sum(f.endswith('c.iso') for f in found) == 1
+    assert sum(f.endswith('top.iso') for f in found) == 1
+
+
+def test_walk_is_lazy(tree):
+    it = walk(tree, max_depth=None)
+    assert next(it)[0].name == 'top.iso'
+    (tree / 'US' / 'late.iso').touch()
+    # Directories are only listed when they are reached
+    assert 'late.iso' in [e.name for e, _ in it]
+
+
+def test_directory_index(tree):
+    for f in ('top.cue', 'top.iso.md5', 'top.', 'topper.iso', 'top 2.iso', '.top.iso', 'EU.iso'):
+        (tree / f).touch()
+    entry, index = next(walk(tree))
+    # Same results as a glob for each stem
+    for stem in ('top', 'top 2', 'topper', 'EU', '.top', 'missing'):
+        expected = sorted(p.name for p in tree.glob(glob.escape(stem) + '.*'))
+        assert sorted(index.companions(stem)) == expected
@@ -49,6 +49,34 @@ class TestSfo(unittest.TestCase):
         self.assertDictEqual(self.SFO_DATA, sfo.parameters._asdict())
 
 
+    def test_read_buffer(self):
+        import mmap
+        from ps3iso.sfo import SfoFile
+        from ps3iso.sfo.errors import SfoParseError
+        with open(self.SFO_FILE, 'rb') as f:
+            data = f.read()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                self.assertDictEqual(self.SFO_DATA, SfoFile.parse(mapping).parameters._asdict())
+        self.assertDictEqual(self.SFO_DATA, SfoFile.parse(data).parameters._asdict())
+        self.assertDictEqual(self.SFO_DATA, SfoFile.parse(memoryview(bytearray(data))).parameters._asdict())
+        # Truncating the data anywhere after the index table is detected
+        with self.assertRaises(SfoParseError):
+            SfoFile.parse(data[:-100])
+        with self.assertRaises(SfoParseError):
+            SfoFile.parse(data[:300])
+        # Keys which are not valid UTF-8
+        with self.assertRaises(SfoParseError):
+            SfoFile.parse(data.replace(b'TITLE_ID\0', b'TITLE_\xffD\0'))
+        # An int32 value starting 2 bytes before the end of the data (ATTRIBUTE is the second entry)
+        import struct
+        broken = bytearray(data)
+        data_table_start = struct.unpack_from('<I', data, 12)[0]
+        struct.pack_into('<2I', broken, 20 + 16 + 4, 0, 4)
+        struct.pack_into('<I', broken, 20 + 16 + 12, len(data) - data_table_start - 2)
+        with self.assertRaises(SfoParseError):
+            SfoFile.parse(bytes(broken))
+
+
     def test_write_file(self):
         from ps3iso.sfo import SfoFile
         sfo = SfoFile.parse_file(self.SFO_FILE)
@@ -87,6 +115,28 @@ class TestSfo(unittest.TestCase):
         with self.assertRaises(SfoMissingParameterError):
             sfo.verify_parameters(SfoCategory.PS3)
 
+    def test_validate(self):
+        from ps3iso.sfo.file import SfoFile
+        from ps3iso.sfo.parameters import SfoCategory, SFO_REQUIRED_PARAMETERS, VALID_SFO_PARAMETERS
+        # The precomputed sets match the categories of every parameter
+        for category in SfoCategory:
+            self.assertEqual(SFO_REQUIRED_PARAMETERS[category],
+                             {p.name for p in VALID_SFO_PARAMETERS.values() if category in p.required})
+        sfo = SfoFile.parse_file(self.SFO_FILE)
+        self.assertEqual(sfo.validate(), [])
+        sfo = SfoFile.parse_file(self.SFO_FILE + '.invalid_ps3')
+        problems = sfo.validate()
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith('Missing required parameters for SfoCategory.PS3'))
+        # Every problem is reported
+        sfo = SfoFile.parse_file(self.SFO_FILE)
+        sfo.get_parameter('TITLE_ID')._value = 'BLES000000000000'
+        sfo.get_parameter('CATEGORY')._value = 'XX'
+        self.assertEqual(sfo.validate(), [
+            "Unknown SFO category code: 'XX'", 'TITLE_ID is 17 bytes long, the maximum is 16'])
+        self.assertEqual(sfo.validate(SfoCategory.PSP)[0],
+                         'Missing required parameters for SfoCategory.PSP: DISC_ID, DISC_VERSION, PSP_SYSTEM_VER')
+
     def test_variable_key_param(self):
         from ps3iso.sfo.file import SfoFile
         print(self.SFO_FILE + '.variable-key')
@@ -97,6 +147,21 @@ class TestSfo(unittest.TestCase):
         self.assertTrue(hasattr(sfo.parameters, key))
         self.assertEqual(getattr(sfo.parameters, key), value)
 
+    def test_variable_key_registry(self):
+        from ps3iso.sfo import SfoParameter, VALID_SFO_PARAMETERS, SFO_PARAMETER_REGISTRY
+        from ps3iso.sfo.errors import SfoUnknownParameterError
+        p = SfoParameter.new('TITLEID029', 'BLES00029')
+        self.assertEqual(p.name, 'TITLEID029')
+        self.assertEqual(p.maxlength, 16)
+        # Prototypes are left untouched
+        self.assertEqual(VALID_SFO_PARAMETERS['TITLEID0xx'].name, 'TITLEID0xx')
+        self.assertEqual(SFO_PARAMETER_REGISTRY['TITLEID029'].value, '')
+        self.assertEqual(len([k for k in SFO_PARAMETER_REGISTRY if k[:6] == 'TITLE_' and k[6:].isdigit()]), 30)
+        with self.assertRaises(TypeError):
+            SFO_PARAMETER_REGISTRY['TITLE_30'] = p
+        with self.assertRaises(SfoUnknownParameterError):
+            SfoParameter.new('TITLE_30')
+
 
     def test_format(self):
         from ps3iso.sfo import SfoFile
@@ -135,6 +200,121 @@ class TestSfo(unittest.TestCase):
         self.assertEqual(params.TITLE_ID, self.SFO_DATA['TITLE_ID'])
         self.assertEqual(params.APP_VER, self.SFO_DATA['APP_VER'])
 
+    def test_parameters_container(self):
+        import pickle
+        from ps3iso.sfo import SfoFile, SfoParameters
+        a = SfoFile.parse_file(self.SFO_FILE)
+        b = SfoFile.parse_file(self.SFO_FILE)
+        # No new class is created for each parse
+        self.assertIs(type(a.parameters), SfoParameters)
+        self.assertIs(type(a.parameters), type(b.parameters))
+        params = a.parameters
+        self.assertEqual(params._fields, tuple(sorted(self.SFO_DATA)))
+        self.assertEqual(list(params), [self.SFO_DATA[k] for k in params._fields])
+        self.assertEqual(len(params), len(self.SFO_DATA))
+        self.assertEqual(params[0], self.SFO_DATA['APP_VER'])
+        self.assertEqual(params, b.parameters)
+        self.assertEqual(hash(params), hash(b.parameters))
+        self.assertEqual(len({params, b.parameters, params._replace(TITLE='Other')}), 2)
+        # Containers with the same parameters in a different order are not equal, like named tuples
+        self.assertNotEqual(SfoParameters(TITLE=1, TITLE_ID=2), SfoParameters(TITLE_ID=2, TITLE=1))
+        # Added parameters keep the container sorted, so it matches the file when parsed again
+        a.add_parameter('REGION_DENY', 1)
+        parsed = SfoFile.parse(bytes(a))
+        self.assertEqual(a.parameters._fields, tuple(sorted(a.parameters._fields)))
+        self.assertEqual(a.parameters, parsed.parameters)
+        self.assertEqual(hash(a.parameters), hash(parsed.parameters))
+        self.assertEqual(len({a.parameters, parsed.parameters}), 1)
+        self.assertEqual(params, tuple(params))
+        self.assertEqual(pickle.loads(pickle.dumps(params)), params)
+        with self.assertRaises(AttributeError):
+            params.TITLE = 'NewTitle'
+        with self.assertRaises(AttributeError):
+            params._missing
+        # Removing every parameter leaves an empty container
+        for key in a.keys:
+            a.remove_parameter(key)
+        self.assertEqual(a.parameters._asdict(), {})
+
+    def test_lazy_parse(self):
+        from unittest import mock
+        from ps3iso.sfo import SfoFile, SfoParameter
+        from ps3iso.sfo.errors import SfoParseError
+        with open(self.SFO_FILE, 'rb') as f:
+            data = f.read()
+        with mock.patch.object(SfoParameter, 'new', wraps=SfoParameter.new) as new:
+            sfo = SfoFile.parse(data, lazy=True)
+            self.assertEqual(sfo.keys, sorted(self.SFO_DATA))
+            self.assertEqual(new.call_count, 0)
+            self.assertEqual(sfo.format('[%I]'), '[BLES00000]')
+            self.assertEqual(sfo.parameters.TITLE_ID, 'BLES00000')
+            self.assertEqual(new.call_count, 1)
+            self.assertDictEqual(self.SFO_DATA, dict(iter(sfo)))
+            self.assertEqual(new.call_count, len(self.SFO_DATA))
+        self.assertEqual(bytes(sfo), data)
+        self.assertEqual(sfo.parameters, SfoFile.parse(data).parameters)
+
+        # Invalid values are only reported when they are accessed
+        data = data.replace(b'TITLE_ID\0', b'TITLE_IX\0')
+        with self.assertRaises(SfoParseError):
+            SfoFile.parse(data)
+        sfo = SfoFile.parse(data, lazy=True)
+        self.assertEqual(sfo.parameters.TITLE, self.SFO_DATA['TITLE'])
+        with self.assertRaises(SfoParseError):
+            sfo.parameters.TITLE_IX
+
+
+    def test_projected_parse(self):
+        from ps3iso.sfo import SfoFile
+        with open(self.SFO_FILE, 'rb') as f:
+            data = f.read()
+        keys = {'TITLE', 'TITLE_ID', 'VERSION'}
+        for lazy in (False, True):
+            sfo = SfoFile.parse(data, lazy=lazy, keys=keys)
+            self.assertEqual(sfo.keys, sorted(keys))
+            self.assertDictEqual({k: self.SFO_DATA[k] for k in keys}, sfo.parameters._asdict())
+            # The index describes only the projected parameters, so the result can be written back
+            self.assertEqual(sfo.header.table_entries, 3)
+            self.assertEqual(SfoFile.parse(bytes(sfo)).parameters, sfo.parameters)
+            self.assertEqual(sfo.index_table, SfoFile.parse(bytes(sfo)).index_table)
+        # Projected values are still only decoded on access
+        from unittest import mock
+        from ps3iso.sfo import SfoParameter
+        with mock.patch.object(SfoParameter, 'new', wraps=SfoParameter.new) as new:
+            sfo = SfoFile.parse(data, lazy=True, keys=keys)
+            self.assertEqual(new.call_count, 0)
+            self.assertEqual(sfo.header.table_entries, 3)
+            self.assertEqual(sfo.parameters.TITLE, self.SFO_DATA['TITLE'])
+            self.assertEqual(new.call_count, 1)
+        self.assertEqual(sfo.index_table, SfoFile.parse(data, keys=keys).index_table)
+        # Keys outside the projection are never validated
+        invalid = data.replace(b'TITLE_ID\0', b'TITLE_IX\0')
+        self.assertEqual(SfoFile.parse(invalid, keys={'TITLE'}).parameters.TITLE, self.SFO_DATA['TITLE'])
+        # Parsing stops once every key is found, so data after the last one is never read
+        self.assertEqual(SfoFile.parse(data[:-100], keys={'APP_VER'}).parameters.APP_VER, self.SFO_DATA['APP_VER'])
+        self.assertEqual(SfoFile.parse(data, keys=()).keys, [])
+
+
+    def test_memory_footprint(self):
+        # Parsed files share their parameter names and category data, and hold a packed index table
+        import gc
+        import tracemalloc
+        from ps3iso.sfo import SfoFile
+        with open(self.SFO_FILE, 'rb') as f:
+            data = f.read()
+        SfoFile.parse(data)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            sfos = [SfoFile.parse(data) for _ in range(1000)]
+            gc.collect()
+            per_sfo = tracemalloc.get_traced_memory()[0] / len(sfos)
+        finally:
+            tracemalloc.stop()
+        # Each file used over 7KB when parameters, headers and index entries had a __dict__
+        self.assertLess(per_sfo, 3500)
+        self.assertIs(sfos[0].get_parameter('TITLE').required, sfos[1].get_parameter('TITLE').required)
+
 
     def test_get_parameter(self):
         from ps3iso.sfo import SfoFile
@@ -195,6 +375,75 @@ class TestSfo(unittest.TestCase):
         self.assertEqual(getattr(sfo.parameters, 'PARAMS'), 'Test Parameters')
         self.assertNotEqual(bytes(sfo), expected_bytes)
 
+    def test_cached_serialization(self):
+        from unittest import mock
+        from ps3iso.sfo import SfoFile, SfoParameter
+
+        def rebuilt(sfo):
+            # Serialize a new object holding the same parameters
+            copy = SfoFile()
+            for k, v in sfo:
+                copy.add_parameter(k, v)
+            copy.header.version = sfo.header.version
+            return bytes(copy)
+
+        sfo = SfoFile.parse_file(self.SFO_FILE)
+        expected = bytes(sfo)
+        with mock.patch.object(SfoParameter, '__bytes__', autospec=True, side_effect=SfoParameter.__bytes__) as encode:
+            self.assertEqual(bytes(sfo), expected)
+            self.assertEqual(repr(sfo), '<SfoFile parameters=12 size=1041>')
+            self.assertEqual(encode.call_count, 0)
+            # Only the changed slot is encoded again
+            sfo.set_parameter('TITLE', 'NewTitle')
+            self.assertEqual(bytes(sfo), rebuilt(sfo))
+            self.assertEqual(bytes(sfo), rebuilt(sfo))
+        first = encode.call_args_list[0][0][0]
+        self.assertEqual(first.name, 'TITLE')
+        # Changes made through get_parameter are also picked up
+        sfo.get_parameter('VERSION').value = '02.00'
+        self.assertEqual(SfoFile.parse(bytes(sfo)).parameters.VERSION, '02.00')
+        # Added or removed parameters change the layout
+        sfo.remove_parameter('LICENSE')
+        self.assertEqual(bytes(sfo), rebuilt(sfo))
+        sfo.add_parameter('REGION_DENY', 42)
+        self.assertEqual(bytes(sfo), rebuilt(sfo))
+
+    def test_patch_file(self):
+        from ps3iso.sfo import SfoFile
+        sfo = SfoFile.parse_file(self.SFO_FILE)
+        sfo.write_file(self.OUTFILE)
+        inode = os.stat(self.OUTFILE).st_ino
+        # Values which fit their slot are written in place
+        self.assertTrue(SfoFile.patch_file(self.OUTFILE, TITLE='NewTitle', PARENTAL_LEVEL=3))
+        sfo.set_parameter('TITLE', 'NewTitle')
+        sfo.set_parameter('PARENTAL_LEVEL', 3)
+        with open(self.OUTFILE, 'rb') as f:
+            self.assertEqual(f.read(), bytes(sfo))
+        self.assertEqual(os.stat(self.OUTFILE).st_ino, inode)
+        # New parameters need the file to be rewritten
+        self.assertFalse(SfoFile.patch_file(self.OUTFILE, TITLE='Title', REGION_DENY=1))
+        params = SfoFile.parse_file(self.OUTFILE).parameters
+        self.assertEqual((params.TITLE, params.REGION_DENY, params.PARENTAL_LEVEL), ('Title', 1, 3))
+
+    def test_patch_file_multibyte(self):
+        from ps3iso.sfo import SfoFile
+        SfoFile.parse_file(self.SFO_FILE).write_file(self.OUTFILE)
+        # 126 bytes and a terminator fit the 128 byte TITLE slot, and the index holds the length in bytes
+        self.assertTrue(SfoFile.patch_file(self.OUTFILE, TITLE='é' * 63))
+        sfo = SfoFile.parse_file(self.OUTFILE)
+        self.assertEqual(sfo.parameters.TITLE, 'é' * 63)
+        self.assertEqual(sfo.parameters.TITLE_ID, self.SFO_DATA['TITLE_ID'])
+        self.assertEqual(sfo.parameters.VERSION, self.SFO_DATA['VERSION'])
+        entry = sfo.index_table[sfo.keys.index('TITLE')]
+        self.assertEqual(entry.data_len, 127)
+        # 127 characters pass the length check in characters, but are 254 bytes long
+        with open(self.OUTFILE, 'rb') as f:
+            before = f.read()
+        with self.assertRaises(ValueError):
+            SfoFile.patch_file(self.OUTFILE, TITLE='é' * 127)
+        with open(self.OUTFILE, 'rb') as f:
+            self.assertEqual(f.read(), before)
+
 
     def test_remove_parameter(self):
         from ps3iso.sfo import SfoFile
@@ -219,6 +468,27 @@ class TestSfo(unittest.TestCase):
         p = getattr(sfo.parameters, 'TITLE')
         self.assertEqual(p, eval(repr(p)))
 
+    def test_index_table_mutation(self):
+        from ps3iso.sfo import SfoFile
+        sfo = SfoFile.parse_file(self.SFO_FILE)
+        table = sfo.index_table
+        entries = list(table)
+        entry = table[1]
+        entry.data_len = 2
+        table[1] = entry
+        entries[1] = entry
+        self.assertEqual(table, entries)
+        table.insert(-1, entries[0])
+        entries.insert(-1, entries[0])
+        del table[0]
+        del entries[0]
+        table.extend(entries[:2])
+        entries.extend(entries[:2])
+        table[2:4] = entries[5:6]
+        entries[2:4] = entries[5:6]
+        self.assertEqual(table, entries)
+        self.assertEqual(len(table), len(entries))
+
     def test_iter(self):
         from ps3iso.sfo import SfoFile
         sfo = SfoFile.parse_file(self.SFO_FILE)
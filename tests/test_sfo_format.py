@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from ps3iso.game import Game
+from ps3iso.sfo import FormatTemplate, SfoFile
+from ps3iso.sfo.format import SFO_FORMAT_VARIABLES
+
+
+FORMATS = [
+    '',
+    'plain text',
+    '[%I]_(%T).iso',
+    '%A%a%C%L%P%R%S%T%I%V%v',
+    '%%I %X %',
+    '{\\n\\t"file": "%p",\\n\\t"name": "%f",\\n\\t"title": "%T"\\n}',
+]
+
+
+def replace_variables(sfo: SfoFile, fmt: str) -> str:
+    # The chained replacements previously used by SfoFile.format
+    for variable, name in SFO_FORMAT_VARIABLES.items():
+        if variable in fmt:
+            value = getattr(sfo.parameters, name, None)
+            fmt = fmt.replace(variable, '' if value is None else str(value).strip())
+    return fmt
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_render_matches_replace(sfo_file: Path, fmt: str):
+    sfo = SfoFile.parse_file(sfo_file)
+    assert FormatTemplate(fmt).render(sfo) == sfo.format(fmt) == replace_variables(sfo, fmt)
+    path = Path('/isos/Game.iso')
+    expected = (replace_variables(sfo, fmt).replace('\\n', '\n').replace('\\t', '\t')
+                .replace('%f', path.name).replace('%p', str(path)))
+    assert FormatTemplate(fmt, file_variables=True).render(sfo, path) == expected
+    assert FormatTemplate(fmt).keys == SfoFile.format_keys(fmt)
+
+
+def test_print_info_template(game_object: Game, capfd: pytest.CaptureFixture):
+    template = FormatTemplate('%I %f', file_variables=True)
+    assert template.uses_path
+    assert FormatTemplate.compile('%I %f', file_variables=True) is FormatTemplate.compile('%I %f', file_variables=True)
+    game_object.print_info(template)
+    assert capfd.readouterr().out == 'BLES00000 dummy.iso\n'
+    game_object.print_info('%I\\t%T')
+    assert capfd.readouterr().out == 'BLES00000\tExample PS3ISO Game Title\n'
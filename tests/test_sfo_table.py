@@ -0,0 +1,88 @@
+import struct
+from array import array
+from pathlib import Path
+
+import pytest
+
+from ps3iso.sfo import SfoFile, SfoTable
+from ps3iso.sfo.errors import SfoParseError
+from ps3iso.sfo.parameters import SfoParameterFormat
+from ps3iso.sfo.table import numpy
+
+from .conftest import TEST_DATA
+
+
+def test_from_buffers(sfo_file: Path, sfo_data: dict):
+    files = [sfo_file, TEST_DATA / 'PARAM.SFO.variable-key', TEST_DATA / 'PARAM.SFO.invalid_ps3']
+    buffers = [f.read_bytes() for f in files]
+    table = SfoTable.from_buffers(buffers)
+    assert len(table) == 3
+    # Every row matches a full parse of the same file
+    for n, data in enumerate(buffers):
+        assert table.row(n) == SfoFile.parse(data).parameters._asdict()
+    assert table.row(0) == sfo_data
+    assert isinstance(table.column('PARENTAL_LEVEL'), array)
+    assert table.mask('TITLE_01') == bytearray([0, 1, 0])
+    assert table.column('TITLE_01')[0] is None
+    assert table.value_counts('CATEGORY')['DG'] == sum(SfoFile.parse(b).parameters.CATEGORY == 'DG' for b in buffers)
+    assert list(table.column('REGION_DENY')) == [0, 0, 0]
+    assert table.mask('REGION_DENY') == bytearray(3)
+
+
+def test_from_buffers_errors(sfo_file: Path):
+    data = sfo_file.read_bytes()
+    broken = (TEST_DATA / 'PARAM.SFO.broken-magic').read_bytes()
+    with pytest.raises(SfoParseError):
+        SfoTable.from_buffers([data, broken])
+    table = SfoTable.from_buffers([data, broken, memoryview(data)], errors='skip')
+    assert len(table) == 2
+    assert [n for n, ex in table.errors] == [1]
+    assert table.duplicates('TITLE_ID') == {'BLES00000': [0, 1]}
+    # Keys outside a projection are never validated
+    invalid = data.replace(b'TITLE_ID\0', b'TITLE_IX\0')
+    with pytest.raises(SfoParseError):
+        SfoTable.from_buffers([invalid])
+    assert SfoTable.from_buffers([invalid], keys={'TITLE'}).keys == ['TITLE']
+    # Keys which are not valid UTF-8, and an int32 value (ATTRIBUTE) starting 2 bytes before the end of the data
+    undecodable = data.replace(b'TITLE_ID\0', b'TITLE_\xffD\0')
+    short_int = bytearray(data)
+    struct.pack_into('<2I', short_int, 20 + 16 + 4, 0, 4)
+    struct.pack_into('<I', short_int, 20 + 16 + 12, len(data) - struct.unpack_from('<I', data, 12)[0] - 2)
+    for use_numpy in (False, True) if numpy else (False,):
+        table = SfoTable.from_buffers([undecodable, data, bytes(short_int)], errors='skip', use_numpy=use_numpy)
+        assert len(table) == 1
+        assert [n for n, ex in table.errors] == [0, 2]
+        assert all(isinstance(ex, SfoParseError) for n, ex in table.errors)
+
+
+def test_numpy_batches_match(sfo_file: Path):
+    pytest.importorskip('numpy')
+    data = sfo_file.read_bytes()
+    variable = (TEST_DATA / 'PARAM.SFO.variable-key').read_bytes()
+    bad_format = bytearray(data)
+    bad_format[20 + 16 * 3 + 2] = 0x7f
+    # ATTRIBUTE stored as a string, and TITLE_ID using the key of TITLE, which then appears twice
+    mismatch = bytearray(data)
+    mismatch[20 + 16 + 2:20 + 16 + 4] = bytes(SfoParameterFormat.utf8)
+    repeated = bytearray(data)
+    repeated[20 + 16 * 10:20 + 16 * 10 + 2] = repeated[20 + 16 * 9:20 + 16 * 9 + 2]
+    short_int = bytearray(data)
+    struct.pack_into('<2I', short_int, 20 + 16 + 4, 0, 4)
+    struct.pack_into('<I', short_int, 20 + 16 + 12, len(data) - struct.unpack_from('<I', data, 12)[0] - 2)
+    buffers = [
+        data, variable, data[:10], (TEST_DATA / 'PARAM.SFO.broken-magic').read_bytes(),
+        data[:40], bytes(bad_format), data.replace(b'TITLE_ID\0', b'TITLE_IX\0'), data[:-8], b'',
+        bytes(mismatch), bytes(repeated), bytes(short_int), data.replace(b'TITLE_ID\0', b'TITLE_\xffD\0'),
+        data.replace(b'Example PS3ISO', b'Example \xff\xfe3ISO'),
+    ] * 5
+    for keys in (None, {'TITLE', 'PARENTAL_LEVEL'}):
+        tables = [SfoTable.from_buffers(buffers, keys=keys, errors='skip', batch_size=4, use_numpy=use_numpy)
+                  for use_numpy in (False, True)]
+        python, vectorised = ([t.row(n) for n in range(len(t))] for t in tables)
+        assert python == vectorised
+        assert [(n, str(ex)) for n, ex in tables[0].errors] == [(n, str(ex)) for n, ex in tables[1].errors]
+        if keys is None:
+            # Every kind of error was raised
+            assert len(python) == 15
+            assert python[2]['TITLE'] == 'BLES00000'
+            assert len({str(ex) for n, ex in tables[0].errors}) == 9